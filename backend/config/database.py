@@ -0,0 +1,40 @@
+"""
+DATABASE_URL parsing for settings.
+Supports sqlite:///relative/path, sqlite:////absolute/path and
+postgres[ql]://user:password@host:port/name?option=value URLs.
+"""
+
+from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+POSTGRES_SCHEMES = {"postgres", "postgresql", "pgsql"}
+
+
+def parse_database_url(url, base_dir):
+    """
+    Return a DATABASES entry for url.
+    Query parameters become OPTIONS (e.g. ?sslmode=require).
+    """
+    parts = urlsplit(url)
+    options = dict(parse_qsl(parts.query))
+
+    if parts.scheme == "sqlite":
+        path = unquote(parts.path)[1:]
+        return {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": str(Path(base_dir) / path) if path else str(Path(base_dir) / "db.sqlite3"),
+            "OPTIONS": options,
+        }
+
+    if parts.scheme in POSTGRES_SCHEMES:
+        return {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": unquote(parts.path.lstrip("/")),
+            "USER": unquote(parts.username or ""),
+            "PASSWORD": unquote(parts.password or ""),
+            "HOST": parts.hostname or "",
+            "PORT": str(parts.port or ""),
+            "OPTIONS": options,
+        }
+
+    raise ValueError(f"Unsupported DATABASE_URL scheme: {parts.scheme!r}")
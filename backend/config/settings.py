@@ -8,6 +8,8 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
+from config.database import parse_database_url
+
 # Load environment variables
 load_env_path = Path(__file__).resolve().parent.parent / ".env"
 if load_env_path.exists():
@@ -58,6 +60,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "notes.metrics.RequestMetricsMiddleware",  # First, so request totals cover the stack
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # Must be before CommonMiddleware
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -88,20 +91,135 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "config.wsgi.application"
 
+# "wsgi" serves config.wsgi; "asgi" serves config.asgi with uvicorn workers.
+# runner.py sets it from GUNICORN_WORKER_CLASS. The async note endpoints
+# default to on under ASGI, where they avoid a thread per request.
+SERVER_INTERFACE = os.getenv("SERVER_INTERFACE", "wsgi")
+NOTES_ASYNC_API = os.getenv("NOTES_ASYNC_API", str(SERVER_INTERFACE == "asgi")) == "True"
+
 # Database
-# Use /app/data for Railway persistent volume, fallback to BASE_DIR for local dev
+# DATABASE_URL selects the backend (sqlite:///... or postgres://...); without it
+# SQLite is used. Use /app/data for Railway persistent volume, fallback to
+# BASE_DIR for local dev.
 database_path = os.getenv("DATABASE_PATH", str(BASE_DIR / "db.sqlite3"))
 if database_path.startswith("/app/data"):
     # Ensure directory exists for Railway volume mount
     Path("/app/data").mkdir(parents=True, exist_ok=True)
 
-DATABASES = {
+database_url = os.getenv("DATABASE_URL", "")
+if database_url:
+    default_database = parse_database_url(database_url, BASE_DIR)
+else:
+    default_database = {"ENGINE": "django.db.backends.sqlite3", "NAME": database_path, "OPTIONS": {}}
+
+# Keep connections open between requests instead of reconnecting each time.
+# Not under ASGI, as Django's async docs advise: async requests run their
+# queries in per-request threads, whose persistent connections are not reused.
+persistent_conn_max_age = (
+    0 if SERVER_INTERFACE == "asgi" else int(os.getenv("DJANGO_CONN_MAX_AGE", "60"))
+)
+
+if default_database["ENGINE"] == "django.db.backends.sqlite3":
+    if os.getenv("DATABASE_PATH"):
+        default_database["NAME"] = database_path
+    default_database["CONN_MAX_AGE"] = persistent_conn_max_age
+    # Take the write lock when a transaction starts, so concurrent writers
+    # wait on busy_timeout instead of failing with "database is locked"
+    default_database["OPTIONS"].setdefault(
+        "transaction_mode", os.getenv("SQLITE_TRANSACTION_MODE", "IMMEDIATE") or None
+    )
+else:
+    # Each worker process keeps a psycopg connection pool (needs psycopg[pool]);
+    # DB_POOL_MAX_SIZE=0 falls back to persistent per-thread connections.
+    db_pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    if db_pool_max_size:
+        default_database["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": db_pool_max_size,
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+        default_database["CONN_MAX_AGE"] = 0
+    else:
+        default_database["CONN_MAX_AGE"] = persistent_conn_max_age
+    # Exports stream through server-side cursors; disable them behind a
+    # transaction-pooling proxy such as PgBouncer
+    default_database["DISABLE_SERVER_SIDE_CURSORS"] = (
+        os.getenv("DB_DISABLE_SERVER_SIDE_CURSORS", "False") == "True"
+    )
+default_database["CONN_HEALTH_CHECKS"] = True
+
+DATABASES = {"default": default_database}
+
+# SQLite pragmas applied to every new connection (see notes.signals).
+# WAL lets readers proceed while a write is in progress; set a variable to an
+# empty string to leave that pragma at SQLite's default.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-20000"),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+# Cache
+# Local-memory by default (LRU-evicted once DJANGO_CACHE_MAX_ENTRIES is reached).
+# Set DJANGO_CACHE_BACKEND to "file" or "redis" and DJANGO_CACHE_LOCATION to share
+# cached responses across gunicorn workers.
+cache_backends = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+cache_backend = os.getenv("DJANGO_CACHE_BACKEND", "locmem")
+default_cache_locations = {
+    "locmem": "notes-api",
+    "file": str(BASE_DIR / "cache"),
+    "redis": "redis://127.0.0.1:6379/0",
+}
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": database_path,
+        "BACKEND": cache_backends[cache_backend],
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", default_cache_locations[cache_backend]),
+        "TIMEOUT": int(os.getenv("DJANGO_CACHE_TIMEOUT", "300")),
+        "OPTIONS": (
+            {}
+            if cache_backend == "redis"
+            else {"MAX_ENTRIES": int(os.getenv("DJANGO_CACHE_MAX_ENTRIES", "5000"))}
+        ),
     }
 }
 
+# Password hashing
+# DJANGO_PASSWORD_HASHER picks the algorithm for new hashes; the others stay
+# listed so existing hashes verify and are upgraded in the background on login.
+# Cost settings left unset (0) fall back to Django's defaults.
+password_hashers = {
+    "pbkdf2": "notes.hashers.TunablePBKDF2PasswordHasher",
+    "argon2": "notes.hashers.TunableArgon2PasswordHasher",  # needs the argon2 extra
+    "scrypt": "notes.hashers.TunableScryptPasswordHasher",
+}
+preferred_password_hasher = password_hashers[os.getenv("DJANGO_PASSWORD_HASHER", "pbkdf2")]
+PASSWORD_HASHERS = [
+    preferred_password_hasher,
+    *[hasher for hasher in password_hashers.values() if hasher != preferred_password_hasher],
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", "0"))
+PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", "0"))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv("PASSWORD_ARGON2_MEMORY_COST", "0"))
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", "0"))
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.getenv("PASSWORD_SCRYPT_WORK_FACTOR", "0"))
+
+AUTHENTICATION_BACKENDS = ["notes.backends.BackgroundRehashModelBackend"]
+
+# Signed bearer tokens returned by login/register. Clients sending
+# "Authorization: Bearer <token>" are authenticated without a session lookup.
+AUTH_TOKEN_MAX_AGE = int(os.getenv("AUTH_TOKEN_MAX_AGE", str(60 * 60 * 24 * 14)))
+# Seconds each worker keeps authenticated users in memory (0 disables)
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -135,6 +253,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "notes.authentication.CsrfExemptSessionAuthentication",
+        "notes.authentication.SignedTokenAuthentication",
         "rest_framework.authentication.BasicAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
@@ -142,8 +261,79 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 100,
+    # Login attempts are throttled before any password hashing. Counters live
+    # in the default cache, so with per-worker locmem the effective limit is
+    # the rate times the number of workers; use a shared cache for exact limits.
+    "DEFAULT_THROTTLE_RATES": {
+        "login_ip": os.getenv("LOGIN_THROTTLE_IP_RATE", "30/min"),
+        "login_username": os.getenv("LOGIN_THROTTLE_USERNAME_RATE", "10/min"),
+    },
+    # Number of reverse proxies in front of the app, used to find the client IP.
+    # 0 trusts only REMOTE_ADDR; X-Forwarded-For is client-controlled unless
+    # it is read from the right number of trusted proxies.
+    "NUM_PROXIES": int(os.getenv("DJANGO_NUM_PROXIES", "0")),
 }
 
+# Delta sync (/api/notes/changes/)
+# Tombstones for deleted notes are kept this long; older sync tokens force a full refetch
+NOTES_TOMBSTONE_RETENTION_DAYS = int(os.getenv("NOTES_TOMBSTONE_RETENTION_DAYS", "30"))
+NOTES_SYNC_BATCH_SIZE = int(os.getenv("NOTES_SYNC_BATCH_SIZE", "500"))
+# Seconds the final sync token lags behind the read; must exceed the longest
+# transaction that writes notes, or its changes can be skipped
+NOTES_SYNC_SAFETY_WINDOW = float(os.getenv("NOTES_SYNC_SAFETY_WINDOW", "5"))
+
+# Limits on imports, checked before any note is written: entries (NDJSON
+# lines or files in a zip), bytes per line or uncompressed Markdown file
+# (larger ones are skipped) and (uncompressed) bytes overall
+NOTES_IMPORT_MAX_ENTRIES = int(os.getenv("NOTES_IMPORT_MAX_ENTRIES", "250000"))
+NOTES_IMPORT_MAX_ENTRY_SIZE = int(os.getenv("NOTES_IMPORT_MAX_ENTRY_SIZE", str(10 * 1024 * 1024)))
+NOTES_IMPORT_MAX_TOTAL_SIZE = int(os.getenv("NOTES_IMPORT_MAX_TOTAL_SIZE", str(1024 * 1024 * 1024)))
+
+# Seconds a worker may serve categories from its in-memory registry before
+# re-reading them; changes made through Django also invalidate it via the cache
+NOTES_CATEGORY_REGISTRY_TTL = int(os.getenv("NOTES_CATEGORY_REGISTRY_TTL", "60"))
+
+# Live note events (/api/notes/events/, Server-Sent Events)
+# Streams hold their connection open, so they are only served under ASGI.
+# The default broker reaches streams in the same worker process, so runner.py
+# starts a single uvicorn worker with it unless GUNICORN_WORKERS says otherwise;
+# point NOTES_EVENT_BROKER at a shared-bus implementation for multiple workers.
+# Under WSGI the flag is ignored: a sync worker would spend a thread on each
+# stream, buffering it forever without sending anything.
+NOTES_EVENT_STREAM = (
+    SERVER_INTERFACE == "asgi" and os.getenv("NOTES_EVENT_STREAM", "True") == "True"
+)
+NOTES_EVENT_BROKER = os.getenv("NOTES_EVENT_BROKER", "notes.events.InProcessBroker")
+# Seconds between keepalive comments on an idle stream
+NOTES_EVENT_KEEPALIVE = int(os.getenv("NOTES_EVENT_KEEPALIVE", "15"))
+# Reconnect delay suggested to EventSource clients
+NOTES_EVENT_RETRY_MS = int(os.getenv("NOTES_EVENT_RETRY_MS", "3000"))
+# Undelivered events per stream before a slow client is told to resync
+NOTES_EVENT_QUEUE_SIZE = int(os.getenv("NOTES_EVENT_QUEUE_SIZE", "100"))
+
+# Request metrics (Server-Timing headers and /api/metrics/ in Prometheus format)
+NOTES_METRICS = os.getenv("NOTES_METRICS", "True") == "True"
+NOTES_SERVER_TIMING = os.getenv("NOTES_SERVER_TIMING", "True") == "True"
+# Directory shared by the gunicorn workers, so any worker reports all of them;
+# empty reports only the worker that answers the scrape
+NOTES_METRICS_DIR = os.getenv("NOTES_METRICS_DIR", "")
+# Seconds between a worker's snapshot writes to NOTES_METRICS_DIR
+NOTES_METRICS_FLUSH_INTERVAL = float(os.getenv("NOTES_METRICS_FLUSH_INTERVAL", "5"))
+# Bearer token accepted by /api/metrics/ besides staff sessions
+NOTES_METRICS_TOKEN = os.getenv("NOTES_METRICS_TOKEN", "")
+
+# On-demand sampling profiler for NoteViewSet and the auth views: staff send
+# "X-Notes-Profile: 1", or sample a percentage through ProfilerSetting in the
+# admin. Profiles are written to NOTES_PROFILER_DIR; empty turns it off.
+NOTES_PROFILER_DIR = os.getenv("NOTES_PROFILER_DIR", "")
+# speedscope (https://www.speedscope.app) or collapsed (flamegraph.pl input)
+NOTES_PROFILER_FORMAT = os.getenv("NOTES_PROFILER_FORMAT", "speedscope")
+NOTES_PROFILER_INTERVAL_MS = float(os.getenv("NOTES_PROFILER_INTERVAL_MS", "5"))
+# Newest profiles kept; older ones are deleted as new ones are written
+NOTES_PROFILER_MAX_FILES = int(os.getenv("NOTES_PROFILER_MAX_FILES", "50"))
+# Seconds a worker caches the admin's sampling setting
+NOTES_PROFILER_REFRESH = int(os.getenv("NOTES_PROFILER_REFRESH", "10"))
+
 # CORS Configuration
 # Allow frontend to make requests from configured origins
 # Can be set via CORS_ALLOWED_ORIGINS env var (comma-separated)
@@ -169,6 +359,7 @@ CORS_ALLOW_HEADERS = [
     "origin",
     "user-agent",
     "x-csrftoken",
+    "x-notes-profile",
     "x-requested-with",
 ]
 
@@ -207,7 +398,11 @@ SESSION_COOKIE_DOMAIN = None
 CSRF_COOKIE_DOMAIN = None
 
 # Logging Configuration
-# Enable verbose logging for debugging authentication issues
+# Console output goes through a queue so request threads never block on I/O.
+# Auth instrumentation is off by default; set AUTH_INSTRUMENTATION_SAMPLE_RATE
+# (0.0-1.0) and NOTES_LOG_LEVEL=DEBUG to log a sample of authentications.
+AUTH_INSTRUMENTATION_SAMPLE_RATE = float(os.getenv("AUTH_INSTRUMENTATION_SAMPLE_RATE", "0"))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -223,7 +418,7 @@ LOGGING = {
     },
     "handlers": {
         "console": {
-            "class": "logging.StreamHandler",
+            "class": "notes.logging_handlers.QueueStreamHandler",
             "formatter": "verbose",
         },
     },
@@ -249,7 +444,7 @@ LOGGING = {
         },
         "notes": {
             "handlers": ["console"],
-            "level": "DEBUG",
+            "level": os.getenv("NOTES_LOG_LEVEL", "INFO"),
             "propagate": False,
         },
     },
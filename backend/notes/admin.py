@@ -3,7 +3,7 @@ Admin configuration for notes app.
 """
 from django.contrib import admin
 
-from .models import Category, Note
+from .models import Category, Note, ProfilerSetting
 
 
 @admin.register(Category)
@@ -20,3 +20,12 @@ class NoteAdmin(admin.ModelAdmin):
     search_fields = ["title", "content"]
     readonly_fields = ["created_at", "updated_at"]
 
+
+@admin.register(ProfilerSetting)
+class ProfilerSettingAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "sample_percent", "endpoint", "expires_at", "updated_at"]
+    readonly_fields = ["updated_at"]
+
+    def has_add_permission(self, request):
+        # Only the first row is read, so keep a single one
+        return super().has_add_permission(request) and not ProfilerSetting.objects.exists()
@@ -0,0 +1,270 @@
+"""
+Async note endpoints for the ASGI server.
+List, retrieve and create run on the event loop with the async ORM, so one
+worker holds many concurrent keep-alive clients without a thread per request.
+NoteViewSet still decides querysets, serializers, pagination, ETags and cache
+keys. Requests these views don't cover (search, ?page=, updates, deletes,
+Basic auth, the browsable API) are handed to the sync NoteViewSet.
+note_events streams the user's live note events as Server-Sent Events.
+note_export serves the sync export action with its chunks pulled through an
+async iterator, which ASGI streams instead of buffering the whole export.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    NotFound,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .authentication import SignedTokenAuthentication, log_auth_attempt, should_instrument_auth
+from .cache import aresponse_cache_key
+from .cache import stats as cache_stats
+from .conditional import aget_validators, set_validator_headers
+from .events import Event, event_stream, get_broker
+from .metrics import measure
+from .models import Note
+from .profiling import profiled
+from .registry import attach_categories
+from .registry import registry as category_registry
+from .views import NoteViewSet
+
+sync_note_list = NoteViewSet.as_view({"get": "list", "post": "create"})
+sync_note_detail = NoteViewSet.as_view(
+    {"get": "retrieve", "put": "update", "patch": "partial_update", "delete": "destroy"}
+)
+sync_note_export = NoteViewSet.as_view({"get": "export"})
+
+# Query parameters only the sync viewset understands
+SYNC_ONLY_PARAMS = ("q", "page", "format")
+
+
+def async_note_view(sync_view, methods):
+    """
+    Serve methods asynchronously when the request allows it, otherwise hand
+    the request to sync_view. API errors are rendered as DRF would.
+    Both paths can be profiled on request, like NoteViewSet.
+    """
+
+    def decorator(view_func):
+        profiled_view = profiled(view_func)
+
+        @csrf_exempt
+        @functools.wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods or not handles_async(request):
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            try:
+                return await profiled_view(request, *args, **kwargs)
+            except APIException as exc:
+                return error_response(exc)
+
+        return wrapper
+
+    return decorator
+
+
+def handles_async(request):
+    if any(param in request.GET for param in SYNC_ONLY_PARAMS):
+        return False
+    if "text/html" in request.headers.get("Accept", ""):
+        return False
+    authorization = request.headers.get("Authorization", "")
+    return not authorization or authorization.lower().startswith("bearer ")
+
+
+def render_json(data, status=status.HTTP_200_OK):
+    response = HttpResponse(
+        JSONRenderer().render(data), status=status, content_type="application/json"
+    )
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+def error_response(exc):
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    # Session authentication comes first and sends no WWW-Authenticate
+    # challenge, so DRF answers authentication failures with 403
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        return render_json(data, status=status.HTTP_403_FORBIDDEN)
+    return render_json(data, status=exc.status_code)
+
+
+async def authenticate(request):
+    """(user, auth) like the DRF classes: session first, then a bearer token."""
+    with measure("auth"):
+        user = await request.auser()
+    if should_instrument_auth():
+        log_auth_attempt(request, (user, None) if user.is_authenticated else None)
+    if user.is_active:
+        return user, None
+    user_auth_tuple = await SignedTokenAuthentication().aauthenticate(request)
+    if user_auth_tuple is None:
+        raise NotAuthenticated()
+    return user_auth_tuple
+
+
+async def get_view(request, action, **kwargs):
+    """A NoteViewSet for this request, with an authenticated DRF Request."""
+    drf_request = Request(
+        request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]
+    )
+    drf_request.accepted_renderer = JSONRenderer()
+    drf_request.accepted_media_type = JSONRenderer.media_type
+    drf_request.user, drf_request.auth = await authenticate(request)
+
+    return NoteViewSet(
+        request=drf_request,
+        args=(),
+        kwargs=kwargs,
+        action=action,
+        format_kwarg=None,
+        basename="note",
+    )
+
+
+async def serialize_note(view, note):
+    """
+    Serialize one note, counting its category's notes with the async ORM
+    unless the view's validators already did.
+    """
+    context = await view.aget_serializer_context()
+    if "category_note_counts" not in context:
+        context["category_note_counts"] = {
+            note.category_id: await Note.objects.filter(
+                owner=view.request.user, category_id=note.category_id
+            ).acount()
+        }
+    return view.get_serializer_class()(note, context=context).data
+
+
+async def list_data(view):
+    """One cursor page of notes, as NoteViewSet.list builds it."""
+    queryset = view.filter_queryset(view.get_queryset())
+    paginator = view.paginator
+    notes = await paginator.apaginate_queryset(queryset, view.request, view=view)
+    attach_categories(notes, await category_registry.acategories())
+    serializer = view.get_serializer_class()(
+        notes, many=True, context=await view.aget_serializer_context()
+    )
+    data = paginator.get_paginated_response(serializer.data).data
+    if view.is_compact_view():
+        data["categories"] = view.get_category_map(notes)
+    return data
+
+
+async def cached_list_data(view, etag):
+    """list_data through the per-user versioned response cache."""
+    key = await aresponse_cache_key(view, view.request, etag)
+    data = await cache.aget(key)
+    cache_stats.record(hit=data is not None)
+    if data is None:
+        data = await list_data(view)
+        await cache.aset(key, data)
+    return data
+
+
+async def create_note(request):
+    view = await get_view(request, "create")
+    serializer = view.get_serializer_class()(
+        data=view.request.data, context=await view.aget_serializer_context()
+    )
+    # Field validation looks up the category, which the sync serializer does
+    if not await sync_to_async(serializer.is_valid)():
+        return render_json(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    note = await Note.objects.acreate(owner=view.request.user, **serializer.validated_data)
+    # No transaction is open here, so the note is already committed
+    get_broker().publish(note.owner_id, Event("note.created", view.get_event_data(note)))
+    return render_json(await serialize_note(view, note), status=status.HTTP_201_CREATED)
+
+
+@async_note_view(sync_note_list, methods=("GET", "POST"))
+async def note_list(request):
+    """GET lists a cursor page of notes (full or ?view=compact); POST creates a note."""
+    if request.method == "POST":
+        return await create_note(request)
+
+    view = await get_view(request, "list")
+    etag, last_modified = await aget_validators(view, view.request)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = render_json(await cached_list_data(view, etag))
+    set_validator_headers(response, etag, last_modified)
+    return response
+
+
+@async_note_view(sync_note_detail, methods=("GET",))
+async def note_detail(request, pk):
+    """GET retrieves one note; other methods go to the sync viewset."""
+    view = await get_view(request, "retrieve", pk=pk)
+    etag, last_modified = await aget_validators(view, view.request)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        try:
+            note = await view.get_queryset().aget(pk=pk)
+        except Note.DoesNotExist:
+            raise NotFound("No Note matches the given query.")
+        attach_categories([note], await category_registry.acategories())
+        response = render_json(await serialize_note(view, note))
+    set_validator_headers(response, etag, last_modified)
+    return response
+
+
+async def note_events(request):
+    """
+    GET streams the user's note.created / note.updated / note.deleted events
+    as text/event-stream, with periodic keepalive comments.
+    """
+    if request.method != "GET":
+        return render_json(
+            {"detail": f'Method "{request.method}" not allowed.'},
+            status=status.HTTP_405_METHOD_NOT_ALLOWED,
+        )
+    try:
+        user, _ = await authenticate(request)
+    except APIException as exc:
+        return error_response(exc)
+
+    response = StreamingHttpResponse(event_stream(user.pk), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Ask nginx-style proxies not to buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def iterate_in_thread(iterator):
+    """
+    Yield from a sync iterator, advancing it in the request's sync thread,
+    where its database cursor lives.
+    """
+    iterator = iter(iterator)
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(iterator, None)) is not None:
+            yield chunk
+    finally:
+        if hasattr(iterator, "close"):
+            await sync_to_async(iterator.close)()
+
+
+@csrf_exempt
+async def note_export(request):
+    """
+    GET streams the export from the sync viewset action. The ASGI handler
+    reads a sync streaming body into memory before sending it, so its
+    chunks are handed over through iterate_in_thread instead.
+    """
+    response = await sync_to_async(sync_note_export)(request)
+    if response.streaming and not response.is_async:
+        response.streaming_content = iterate_in_thread(response.streaming_content)
+    return response
@@ -1,8 +1,29 @@
 """
 Custom authentication classes for DRF.
-Disables CSRF checking for API endpoints while maintaining session auth.
+Disables CSRF checking for API endpoints while maintaining session auth,
+and accepts signed stateless bearer tokens that need no session lookup.
 """
-from rest_framework.authentication import SessionAuthentication
+import logging
+import random
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from rest_framework.authentication import (
+    BaseAuthentication,
+    SessionAuthentication,
+    get_authorization_header,
+)
+from rest_framework.exceptions import AuthenticationFailed
+
+from .backends import aget_cached_user, get_cached_user, rehashed_auth_hash_key
+from .metrics import measure
+from .models import RehashedAuthHash
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SALT = "notes.authentication.SignedTokenAuthentication"
 
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
@@ -12,22 +33,10 @@ class CsrfExemptSessionAuthentication(SessionAuthentication):
     """
 
     def authenticate(self, request):
-        # Detailed logging to debug 403 errors
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        logger.info(f"Authenticating request: {request.method} {request.path}")
-        logger.info(f"Headers: {dict(request.headers)}")
-        logger.info(f"Cookies: {request.COOKIES}")
-        
-        user_auth_tuple = super().authenticate(request)
-        
-        if user_auth_tuple is None:
-            logger.warning("Authentication failed: No user found in session")
-        else:
-            user, _ = user_auth_tuple
-            logger.info(f"Authentication successful for user: {user.username}")
-            
+        with measure("auth"):
+            user_auth_tuple = super().authenticate(request)
+        if should_instrument_auth():
+            log_auth_attempt(request, user_auth_tuple)
         return user_auth_tuple
 
     def enforce_csrf(self, request):
@@ -37,3 +46,148 @@ class CsrfExemptSessionAuthentication(SessionAuthentication):
         """
         return  # Skip CSRF check
 
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Stateless "Authorization: Bearer <token>" authentication.
+    Tokens are signed with SECRET_KEY and carry the user id and session auth
+    hash, so they expire after AUTH_TOKEN_MAX_AGE and stop working when the
+    password changes. Users come from the in-process user cache, so most
+    requests authenticate without touching the database.
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        token = self.get_token(request)
+        if token is None:
+            return None
+        with measure("auth"):
+            user_auth_tuple = self.authenticate_credentials(token)
+        if should_instrument_auth():
+            log_auth_attempt(request, user_auth_tuple)
+        return user_auth_tuple
+
+    async def aauthenticate(self, request):
+        """authenticate for async views."""
+        token = self.get_token(request)
+        if token is None:
+            return None
+        with measure("auth"):
+            user_auth_tuple = await self.aauthenticate_credentials(token)
+        if should_instrument_auth():
+            log_auth_attempt(request, user_auth_tuple)
+        return user_auth_tuple
+
+    def get_token(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed("Invalid token header.")
+        return auth[1]
+
+    def authenticate_credentials(self, token):
+        user_pk, auth_hash = self.decode_token(token)
+        user = get_cached_user(user_pk)
+        if user is None or not user.is_active or not token_hash_is_current(user, auth_hash):
+            raise AuthenticationFailed("Invalid or expired token.")
+        return (user, token)
+
+    async def aauthenticate_credentials(self, token):
+        """authenticate_credentials for async views."""
+        user_pk, auth_hash = self.decode_token(token)
+        user = await aget_cached_user(user_pk)
+        if user is None or not user.is_active or not await atoken_hash_is_current(user, auth_hash):
+            raise AuthenticationFailed("Invalid or expired token.")
+        return (user, token)
+
+    def decode_token(self, token):
+        """Return (user_pk, auth_hash) from a signed token."""
+        try:
+            payload = signing.loads(
+                token.decode(), salt=TOKEN_SALT, max_age=settings.AUTH_TOKEN_MAX_AGE
+            )
+            return payload["u"], payload["h"]
+        except (signing.BadSignature, UnicodeDecodeError, TypeError, KeyError):
+            raise AuthenticationFailed("Invalid or expired token.")
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+def issue_token(user):
+    """Create a signed bearer token for user."""
+    return signing.dumps({"u": user.pk, "h": user.get_session_auth_hash()}, salt=TOKEN_SALT)
+
+
+def token_hash_is_current(user, auth_hash):
+    """
+    Whether a token's auth hash still matches the user's password.
+    Tokens issued before a background rehash carry the previous hash; the
+    rehash stored an alias to the new one in RehashedAuthHash. Matching
+    aliases are remembered in the default cache; a stale cached alias (after
+    a further rehash) falls through to the table.
+    """
+    current = user.get_session_auth_hash()
+    if constant_time_compare(auth_hash, current):
+        return True
+    key = rehashed_auth_hash_key(auth_hash)
+    if constant_time_compare(cache.get(key, ""), current):
+        return True
+    alias = (
+        RehashedAuthHash.objects.filter(old_auth_hash=auth_hash)
+        .values_list("new_auth_hash", flat=True)
+        .first()
+    )
+    if alias is None or not constant_time_compare(alias, current):
+        return False
+    cache.set(key, alias, settings.AUTH_TOKEN_MAX_AGE)
+    return True
+
+
+async def atoken_hash_is_current(user, auth_hash):
+    current = user.get_session_auth_hash()
+    if constant_time_compare(auth_hash, current):
+        return True
+    key = rehashed_auth_hash_key(auth_hash)
+    if constant_time_compare(await cache.aget(key, ""), current):
+        return True
+    alias = await (
+        RehashedAuthHash.objects.filter(old_auth_hash=auth_hash)
+        .values_list("new_auth_hash", flat=True)
+        .afirst()
+    )
+    if alias is None or not constant_time_compare(alias, current):
+        return False
+    await cache.aset(key, alias, settings.AUTH_TOKEN_MAX_AGE)
+    return True
+
+
+def should_instrument_auth():
+    """
+    Auth instrumentation is off unless AUTH_INSTRUMENTATION_SAMPLE_RATE > 0
+    and the notes.authentication logger is enabled for DEBUG.
+    """
+    rate = settings.AUTH_INSTRUMENTATION_SAMPLE_RATE
+    return rate > 0 and logger.isEnabledFor(logging.DEBUG) and random.random() < rate
+
+
+def log_auth_attempt(request, user_auth_tuple):
+    """Log one structured auth event. Never includes headers, cookies or session keys."""
+    user = user_auth_tuple[0] if user_auth_tuple else None
+    logger.debug(
+        "auth %s %s authenticated=%s user_id=%s",
+        request.method,
+        request.path,
+        user is not None,
+        user.pk if user else None,
+        extra={
+            "event": "auth",
+            "method": request.method,
+            "path": request.path,
+            "authenticated": user is not None,
+            "user_id": user.pk if user else None,
+            "has_session_cookie": settings.SESSION_COOKIE_NAME in request.COOKIES,
+        },
+    )
@@ -0,0 +1,233 @@
+"""
+Authentication backends for the notes app.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import RehashedAuthHash
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = threading.local()
+
+# Authenticated users by pk, shared by all threads of this process:
+# {pk: (expires_at, user)}. Cached users are treated as read-only.
+_user_cache = {}
+USER_CACHE_MAX_ENTRIES = 10000
+
+
+@dataclass
+class PendingRehash:
+    user_pk: int
+    password: str
+    old_encoded: str
+    session: object = None
+
+
+def _get_executor():
+    """One rehash thread per process, recreated after a fork."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rehash")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def get_cached_user(user_pk):
+    """
+    Return the user with this pk, or None.
+    Loaded users are kept for AUTH_USER_CACHE_TTL seconds, so session and
+    token authentication skip the user query on most requests. Saves in
+    this process evict immediately; other workers see them after the TTL.
+    """
+    entry = _user_cache.get(user_pk)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+
+    UserModel = get_user_model()  # noqa: N806
+    try:
+        user = UserModel._default_manager.get(pk=user_pk)
+    except (UserModel.DoesNotExist, ValueError, TypeError):
+        return None
+    _remember_user(user_pk, user)
+    return user
+
+
+async def aget_cached_user(user_pk):
+    """get_cached_user for async views; misses load the user with the async ORM."""
+    entry = _user_cache.get(user_pk)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+
+    UserModel = get_user_model()  # noqa: N806
+    try:
+        user = await UserModel._default_manager.aget(pk=user_pk)
+    except (UserModel.DoesNotExist, ValueError, TypeError):
+        return None
+    _remember_user(user_pk, user)
+    return user
+
+
+def _remember_user(user_pk, user):
+    if settings.AUTH_USER_CACHE_TTL > 0:
+        if len(_user_cache) >= USER_CACHE_MAX_ENTRIES:
+            _user_cache.clear()
+        _user_cache[user_pk] = (time.monotonic() + settings.AUTH_USER_CACHE_TTL, user)
+
+
+def evict_cached_user(user_pk):
+    _user_cache.pop(user_pk, None)
+
+
+def rehashed_auth_hash_key(old_auth_hash):
+    return f"notes:auth:rehashed:{old_auth_hash}"
+
+
+def _pending_rehashes():
+    if not hasattr(_pending, "rehashes"):
+        _pending.rehashes = []
+    return _pending.rehashes
+
+
+def defer_rehash(user, password, old_encoded):
+    """Queue a hash upgrade for when the current request has finished."""
+    _pending_rehashes().append(PendingRehash(user.pk, password, old_encoded))
+
+
+def attach_rehash_session(request, user):
+    """Remember the session a login stored, so its auth hash can be upgraded too."""
+    for pending in _pending_rehashes():
+        if pending.user_pk == user.pk:
+            pending.session = request.session
+
+
+def discard_pending_rehashes():
+    _pending_rehashes().clear()
+
+
+def submit_pending_rehashes():
+    """
+    Hand queued upgrades to the rehash thread. Called once the response has
+    been sent, after SessionMiddleware has saved the session, so the rehash
+    thread's session update cannot be overwritten by the request.
+    """
+    rehashes = _pending_rehashes()
+    while rehashes:
+        pending = rehashes.pop()
+        session_key = pending.session.session_key if pending.session is not None else None
+        _get_executor().submit(
+            rehash_password, pending.user_pk, pending.password, pending.old_encoded, session_key
+        )
+
+
+def rehash_password(user_pk, password, old_encoded, session_key=None):
+    """
+    Store a hash at the current preferred algorithm and cost.
+    Only replaces the hash that was verified, so a concurrent password
+    change is never overwritten. The login session keeps working because
+    its stored auth hash is moved to the new password hash as well, and
+    tokens issued for the old hash are honoured through RehashedAuthHash,
+    written in the same transaction so no worker sees one without the other.
+    """
+    close_old_connections()
+    try:
+        UserModel = get_user_model()  # noqa: N806
+        encoded = make_password(password)
+        old_user = UserModel(pk=user_pk, password=old_encoded)
+        new_user = UserModel(pk=user_pk, password=encoded)
+        with transaction.atomic():
+            updated = UserModel._default_manager.filter(
+                pk=user_pk, password=old_encoded
+            ).update(password=encoded)
+            if not updated:
+                return
+            record_rehashed_auth_hash(
+                old_user.get_session_auth_hash(), new_user.get_session_auth_hash()
+            )
+        evict_cached_user(user_pk)
+        if session_key:
+            update_session_auth_hash_for_key(session_key, old_user, new_user)
+    finally:
+        close_old_connections()
+
+
+def record_rehashed_auth_hash(old_auth_hash, new_auth_hash):
+    """
+    Point tokens for old_auth_hash, and for any hash that was already
+    aliased to it, at new_auth_hash; drop aliases no valid token can use.
+    """
+    RehashedAuthHash.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=settings.AUTH_TOKEN_MAX_AGE)
+    ).delete()
+    RehashedAuthHash.objects.filter(new_auth_hash=old_auth_hash).update(
+        new_auth_hash=new_auth_hash
+    )
+    RehashedAuthHash.objects.update_or_create(
+        old_auth_hash=old_auth_hash, defaults={"new_auth_hash": new_auth_hash}
+    )
+
+
+def update_session_auth_hash_for_key(session_key, old_user, new_user):
+    """Move a stored session from old_user's auth hash to new_user's."""
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    if not session.exists(session_key):
+        return
+    if session.get(SESSION_KEY) != str(new_user.pk):
+        return
+    if session.get(HASH_SESSION_KEY) != old_user.get_session_auth_hash():
+        return
+    session[HASH_SESSION_KEY] = new_user.get_session_auth_hash()
+    session.save()
+
+
+class BackgroundRehashModelBackend(ModelBackend):
+    """
+    ModelBackend that upgrades outdated password hashes off the request thread.
+    The default backend re-hashes inline, doubling the cost of the login that
+    triggers an upgrade after PASSWORD_HASHERS or its cost settings change.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()  # noqa: N806
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user.
+            UserModel().set_password(password)
+            return None
+
+        encoded = user.password
+
+        def setter(raw_password):
+            defer_rehash(user, raw_password, encoded)
+
+        if check_password(password, encoded, setter=setter) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        user = await aget_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
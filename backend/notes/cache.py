@@ -0,0 +1,128 @@
+"""
+Per-user versioned response cache for list endpoints.
+Cache keys embed a per-user version counter that signals bump on every
+note write, so stale entries are never read and simply age out.
+Keys also embed the view's conditional GET ETag, which is built from the
+database (count and latest change), because the counters live in the
+default cache: with the per-worker locmem cache a write handled by another
+worker never bumps this worker's counters.
+"""
+import functools
+import hashlib
+import os
+import threading
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from .conditional import get_validators
+
+CATEGORIES_VERSION_KEY = "notes:version:categories"
+
+
+def _user_version_key(user_id):
+    return f"notes:version:user:{user_id}"
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached response for a user."""
+    key = _user_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Missing or evicted counter: any fresh value invalidates old keys
+        cache.set(key, 1, timeout=None)
+
+
+def bump_categories_version():
+    """Invalidate cached responses for all users after a category change."""
+    try:
+        cache.incr(CATEGORIES_VERSION_KEY)
+    except ValueError:
+        cache.set(CATEGORIES_VERSION_KEY, 1, timeout=None)
+
+
+def get_versions(user_id):
+    """Return (user_version, categories_version) in a single cache round-trip."""
+    user_key = _user_version_key(user_id)
+    versions = cache.get_many([user_key, CATEGORIES_VERSION_KEY])
+    return versions.get(user_key, 0), versions.get(CATEGORIES_VERSION_KEY, 0)
+
+
+async def aget_versions(user_id):
+    user_key = _user_version_key(user_id)
+    versions = await cache.aget_many([user_key, CATEGORIES_VERSION_KEY])
+    return versions.get(user_key, 0), versions.get(CATEGORIES_VERSION_KEY, 0)
+
+
+class CacheStats:
+    """Process-local hit/miss counters for the response cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "pid": os.getpid(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+stats = CacheStats()
+
+
+def response_cache_key(view, request, etag):
+    """Key a cached response by view, user, data versions, ETag, format and full URL."""
+    return build_response_cache_key(view, request, etag, get_versions(request.user.pk))
+
+
+async def aresponse_cache_key(view, request, etag):
+    return build_response_cache_key(view, request, etag, await aget_versions(request.user.pk))
+
+
+def build_response_cache_key(view, request, etag, versions):
+    user_version, categories_version = versions
+    url = hashlib.sha256(request.build_absolute_uri().encode()).hexdigest()[:32]
+    validator = etag.strip('"')
+    return (
+        f"notes:response:{view.basename}:{view.action}:{request.user.pk}:"
+        f"{user_version}:{categories_version}:{validator}:"
+        f"{request.accepted_renderer.format}:{url}"
+    )
+
+
+def cache_response(view_method):
+    """
+    Decorate a viewset action to serve its response data from the cache.
+    Only successful responses are stored. Under conditional_get the ETag it
+    computed is reused; otherwise the validators are computed here.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag = getattr(self, "validator_etag", None) or get_validators(self, request)[0]
+        key = response_cache_key(self, request, etag)
+        data = cache.get(key)
+        stats.record(hit=data is not None)
+        if data is not None:
+            return Response(data)
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data)
+        return response
+
+    return wrapper
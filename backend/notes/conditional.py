@@ -0,0 +1,70 @@
+"""
+Conditional GET support for API views.
+Answers If-None-Match / If-Modified-Since with 304 Not Modified before
+the queryset is evaluated or serialized.
+"""
+import functools
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def get_validators(view, request):
+    """
+    Build a strong ETag and Last-Modified timestamp for a view.
+    The view's get_validator_state() returns (last_modified, state), where
+    state is any repr-able value that changes whenever the data does.
+    """
+    last_modified, state = view.get_validator_state()
+    return build_validators(request, last_modified, state)
+
+
+async def aget_validators(view, request):
+    """get_validators for async views, using view.aget_validator_state()."""
+    last_modified, state = await view.aget_validator_state()
+    return build_validators(request, last_modified, state)
+
+
+def build_validators(request, last_modified, state):
+    fingerprint = repr(
+        (
+            request.user.pk,
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            last_modified.isoformat() if last_modified else None,
+            state,
+        )
+    )
+    etag = f'"{hashlib.sha256(fingerprint.encode()).hexdigest()[:32]}"'
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return etag, timestamp
+
+
+def conditional_get(view_method):
+    """
+    Decorate a viewset action to honour conditional GET headers.
+    Responses are marked private/no-cache so browsers always revalidate.
+    The ETag is kept on the view as validator_etag for cache_response.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = get_validators(self, request)
+        self.validator_etag = etag
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+        set_validator_headers(response, etag, last_modified)
+        return response
+
+    return wrapper
+
+
+def set_validator_headers(response, etag, last_modified):
+    """Send validators on 200/304 responses, marked private/no-cache."""
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
@@ -0,0 +1,15 @@
+"""
+Database connection tuning.
+SQLite pragmas from settings.SQLITE_PRAGMAS are applied to every new
+connection by a connection_created handler in notes.signals.
+"""
+
+
+def sqlite_pragma_statements(pragmas):
+    """PRAGMA statements for the configured, non-empty pragma values."""
+    return [f"PRAGMA {name} = {value}" for name, value in pragmas.items() if value not in ("", None)]
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    for statement in sqlite_pragma_statements(pragmas):
+        cursor.execute(statement)
@@ -0,0 +1,54 @@
+"""
+Text deltas for incremental note edits.
+A delta is a list of ops applied left to right from the start of the text:
+{"retain": n} keeps n characters, {"delete": n} removes n and
+{"insert": "..."} adds text. Text after the last op is kept. Offsets count
+UTF-16 code units, as JavaScript string lengths do, so browser clients can
+compute them without re-encoding.
+"""
+
+MAX_DELTA_OPS = 1000
+
+
+class DeltaError(ValueError):
+    """The delta is malformed or does not fit the text it is applied to."""
+
+
+def apply_text_delta(text, ops):
+    """Return text with ops applied."""
+    if not isinstance(ops, list) or not ops:
+        raise DeltaError("Expected a non-empty list of ops.")
+    if len(ops) > MAX_DELTA_OPS:
+        raise DeltaError(f"At most {MAX_DELTA_OPS} ops are allowed.")
+
+    units = text.encode("utf-16-le")
+    parts = []
+    position = 0
+    for op in ops:
+        if not isinstance(op, dict) or len(op) != 1:
+            raise DeltaError("Each op must have exactly one of retain, delete or insert.")
+        (kind, value), = op.items()
+        if kind == "insert":
+            if not isinstance(value, str):
+                raise DeltaError("insert must be a string.")
+            try:
+                parts.append(value.encode("utf-16-le"))
+            except UnicodeEncodeError:
+                raise DeltaError("insert contains an unpaired surrogate.") from None
+            continue
+        if kind not in ("retain", "delete"):
+            raise DeltaError(f"Unknown op {kind!r}.")
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise DeltaError(f"{kind} must be a non-negative integer.")
+        end = position + value * 2
+        if end > len(units):
+            raise DeltaError(f"{kind} runs past the end of the text.")
+        if kind == "retain":
+            parts.append(units[position:end])
+        position = end
+    parts.append(units[position:])
+
+    try:
+        return b"".join(parts).decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise DeltaError("An op splits a surrogate pair.") from None
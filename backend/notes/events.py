@@ -0,0 +1,148 @@
+"""
+Live note events for the Server-Sent Events stream.
+NoteViewSet publishes note.created / note.updated / note.deleted events once
+the write commits; every open /api/notes/events/ stream of the owner receives
+them. The broker is chosen by settings.NOTES_EVENT_BROKER. The default
+InProcessBroker only reaches streams served by the same worker process, so
+multi-worker deployments swap in a broker backed by a shared message bus.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+_broker = None
+_broker_lock = threading.Lock()
+_event_ids = itertools.count(1)
+
+# Sent when a subscriber fell behind and dropped events; clients refetch
+RESYNC = "resync"
+
+
+@dataclass
+class Event:
+    type: str
+    data: dict
+    id: int = field(default_factory=lambda: next(_event_ids))
+
+    def encode(self):
+        """The event in text/event-stream framing."""
+        payload = json.dumps(self.data, cls=DjangoJSONEncoder, separators=(",", ":"))
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+class EventBroker:
+    """
+    Interface for NOTES_EVENT_BROKER classes.
+    publish() may be called from any thread; subscribe() and unsubscribe()
+    are called from the event loop serving the stream.
+    """
+
+    def publish(self, user_id, event):
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """Return a subscription whose async get() waits for the user's next event."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class Subscription:
+    """One stream's queue, fed from any thread through its event loop."""
+
+    def __init__(self, user_id, max_size):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_size)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        # A slow client drops its backlog and is told to refetch instead
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = Event(RESYNC, {})
+        self.queue.put_nowait(event)
+
+
+class InProcessBroker(EventBroker):
+    """Delivers events to the streams open in this process."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # The stream's event loop has closed
+                self.unsubscribe(subscription)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, settings.NOTES_EVENT_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.NOTES_EVENT_BROKER)()
+        return _broker
+
+
+def publish_note_event(user_id, event_type, data):
+    """Publish an event to the user's streams once the current transaction commits."""
+    event = Event(event_type, data)
+    transaction.on_commit(lambda: get_broker().publish(user_id, event))
+
+
+async def event_stream(user_id):
+    """
+    Yield text/event-stream chunks for the user until the client disconnects.
+    A "ready" event opens every connection; clients refetch on reconnects,
+    since events published while they were away are not replayed.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    try:
+        yield f"retry: {settings.NOTES_EVENT_RETRY_MS}\n\n"
+        yield Event("ready", {}).encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), settings.NOTES_EVENT_KEEPALIVE)
+            except TimeoutError:
+                # Comment line that keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield event.encode()
+    finally:
+        broker.unsubscribe(subscription)
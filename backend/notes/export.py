@@ -0,0 +1,93 @@
+"""
+Streaming export of a user's notes.
+Generators read through a server-side iterator so memory stays flat
+regardless of how many notes a user has.
+"""
+import json
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.text import slugify
+
+EXPORT_CHUNK_SIZE = 2000
+# Coalesce output into ~64 KiB writes instead of one socket write per note
+STREAM_BUFFER_BYTES = 64 * 1024
+EXPORT_FIELDS = ["id", "title", "content", "category__slug", "created_at", "updated_at"]
+
+
+def iter_export_rows(queryset):
+    """Yield plain dicts for each note, with the category referenced by slug."""
+    rows = queryset.order_by("id").values(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for row in rows:
+        row["category"] = row.pop("category__slug")
+        yield row
+
+
+def iter_ndjson(queryset):
+    """Yield one JSON document per line, one note per document."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    lines = []
+    size = 0
+    for row in iter_export_rows(queryset):
+        line = (encoder.encode(row) + "\n").encode()
+        lines.append(line)
+        size += len(line)
+        if size >= STREAM_BUFFER_BYTES:
+            yield b"".join(lines)
+            lines.clear()
+            size = 0
+    yield b"".join(lines)
+
+
+def render_markdown(row):
+    """Render a note as Markdown with a front matter header."""
+    header = [
+        "---",
+        f"title: {json.dumps(row['title'], ensure_ascii=False)}",
+        f"category: {row['category']}",
+        f"created_at: {row['created_at'].isoformat()}",
+        f"updated_at: {row['updated_at'].isoformat()}",
+        "---",
+        "",
+    ]
+    return "\n".join(header) + row["content"] + "\n"
+
+
+class _ChunkBuffer:
+    """Write-only, non-seekable file object that collects bytes for streaming."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def iter_markdown_zip(queryset):
+    """
+    Yield a zip archive of Markdown files grouped by category slug.
+    The archive is written to a non-seekable buffer, so zipfile emits data
+    descriptors and members can be flushed as soon as they are written.
+    Only the central directory (about 1 KB per note) is held until the end.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for row in iter_export_rows(queryset):
+            name = f"{row['category']}/{row['id']}-{slugify(row['title']) or 'untitled'}.md"
+            with archive.open(name, mode="w") as member:
+                member.write(render_markdown(row).encode())
+            if buffer.size >= STREAM_BUFFER_BYTES:
+                yield buffer.drain()
+    yield buffer.drain()
@@ -0,0 +1,43 @@
+"""
+Password hashers with settings-driven cost.
+Algorithm names match Django's built-ins, so existing hashes keep verifying
+and are re-hashed at the configured cost on the next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with PASSWORD_PBKDF2_ITERATIONS iterations."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with PASSWORD_ARGON2_* costs. Requires the argon2 extra."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST or Argon2PasswordHasher.time_cost
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST or Argon2PasswordHasher.memory_cost
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM or Argon2PasswordHasher.parallelism
+
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with PASSWORD_SCRYPT_WORK_FACTOR as its CPU/memory cost."""
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR or ScryptPasswordHasher.work_factor
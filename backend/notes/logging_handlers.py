@@ -0,0 +1,50 @@
+"""
+Non-blocking logging handlers.
+Request threads only enqueue records; a background listener thread
+formats them and performs the console I/O.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueueStreamHandler(QueueHandler):
+    """
+    Stream handler that hands records to a background QueueListener.
+    The listener is (re)started lazily per process, so it survives the
+    fork of preloaded gunicorn workers.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream)
+        self._listener = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+
+    def setFormatter(self, fmt):  # noqa: N802 (logging.Handler API)
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # In-process queue: skip formatting here, the listener thread does it
+        return record
+
+    def emit(self, record):
+        if self._listener_pid != os.getpid():
+            self._start_listener()
+        super().emit(record)
+
+    def _start_listener(self):
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            # A forked child inherits the queue but not the listener thread
+            self.queue = queue.SimpleQueue()
+            self._listener = QueueListener(self.queue, self.target)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+            atexit.register(self._listener.stop)
@@ -0,0 +1,52 @@
+"""
+Management command to benchmark password hasher throughput.
+Reports single-core logins/second for each configured hasher, so the
+cost settings can be balanced against CPU on login spikes.
+"""
+
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+BENCHMARK_PASSWORD = "correct horse battery staple"
+
+
+class Command(BaseCommand):
+    help = "Measures logins/second per core for each configured password hasher"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=2.0,
+            help="Minimum time to spend verifying passwords per hasher",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'hasher':<16} {'cost':<40} {'ms/login':>9} {'logins/s/core':>14}")
+        for hasher in get_hashers():
+            try:
+                encoded = hasher.encode(BENCHMARK_PASSWORD, hasher.salt())
+            except (ValueError, ImportError) as exc:
+                self.stdout.write(f"{hasher.algorithm:<16} skipped: {exc}")
+                continue
+
+            rounds = 0
+            started = time.perf_counter()
+            while True:
+                hasher.verify(BENCHMARK_PASSWORD, encoded)
+                rounds += 1
+                elapsed = time.perf_counter() - started
+                if elapsed >= options["seconds"]:
+                    break
+
+            cost = ", ".join(
+                f"{key}={value}"
+                for key, value in hasher.decode(encoded).items()
+                if key not in ("algorithm", "hash", "salt")
+            )
+            self.stdout.write(
+                f"{hasher.algorithm:<16} {cost:<40} "
+                f"{elapsed / rounds * 1000:>9.1f} {rounds / elapsed:>14.1f}"
+            )
@@ -0,0 +1,114 @@
+"""
+Management command to benchmark concurrent SQLite reads and writes.
+Copies the configured database and runs a mixed list/edit workload from
+several processes, as gunicorn workers would, once with SQLite's defaults
+and once with SQLITE_PRAGMAS, reporting throughput and lock errors.
+"""
+
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.db import apply_sqlite_pragmas
+
+READ_SQL = (
+    "SELECT id, title, content, category_id, updated_at FROM notes_note "
+    "WHERE owner_id = ? ORDER BY updated_at DESC, id LIMIT 50"
+)
+WRITE_SQL = "UPDATE notes_note SET content = ?, updated_at = datetime('now') WHERE id = ?"
+
+
+def run_worker(path, profile, seconds, write_ratio, seed, results):
+    """Issue reads and single-row updates until the time is up."""
+    tuned = profile == "tuned"
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    if tuned:
+        apply_sqlite_pragmas(conn.cursor(), settings.SQLITE_PRAGMAS)
+    rng = random.Random(seed)
+    owners = [row[0] for row in conn.execute("SELECT DISTINCT owner_id FROM notes_note")]
+    note_ids = [row[0] for row in conn.execute("SELECT id FROM notes_note")]
+
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                conn.execute("BEGIN IMMEDIATE" if tuned else "BEGIN")
+                conn.execute(WRITE_SQL, (f"edited {rng.random()}", rng.choice(note_ids)))
+                conn.execute("COMMIT")
+                writes += 1
+            else:
+                conn.execute(READ_SQL, (rng.choice(owners),)).fetchall()
+                reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+    conn.close()
+    results.put((reads, writes, errors))
+
+
+class Command(BaseCommand):
+    help = "Benchmarks concurrent SQLite throughput with default and tuned pragmas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Concurrent processes")
+        parser.add_argument("--seconds", type=float, default=5.0, help="Duration per profile")
+        parser.add_argument(
+            "--write-ratio", type=float, default=0.2, help="Fraction of operations that write"
+        )
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES["default"]
+        if database["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("The default database is not SQLite.")
+        with sqlite3.connect(database["NAME"]) as conn:
+            if not conn.execute("SELECT 1 FROM notes_note LIMIT 1").fetchone():
+                raise CommandError("The database has no notes to benchmark against.")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            self.stdout.write(
+                f"{options['workers']} workers, {options['seconds']}s per profile, "
+                f"{options['write_ratio']:.0%} writes"
+            )
+            self.stdout.write(f"{'profile':<10} {'reads/s':>10} {'writes/s':>10} {'lock errors':>12}")
+            for profile in ("default", "tuned"):
+                path = os.path.join(tmp, f"{profile}.sqlite3")
+                self.copy_database(database["NAME"], path)
+                reads, writes, errors = self.run_profile(path, profile, options)
+                seconds = options["seconds"]
+                self.stdout.write(
+                    f"{profile:<10} {reads / seconds:>10.0f} {writes / seconds:>10.0f} {errors:>12}"
+                )
+
+    def copy_database(self, source, target):
+        """Copy with the backup API, then reset the copy to a rollback journal."""
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(target)
+        with dst:
+            src.backup(dst)
+        dst.execute("PRAGMA journal_mode = DELETE")
+        src.close()
+        dst.close()
+
+    def run_profile(self, path, profile, options):
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(path, profile, options["seconds"], options["write_ratio"], seed, results),
+            )
+            for seed in range(options["workers"])
+        ]
+        for worker in workers:
+            worker.start()
+        totals = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        return tuple(sum(column) for column in zip(*totals))
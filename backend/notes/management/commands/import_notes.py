@@ -0,0 +1,57 @@
+"""
+Management command to import notes from an export archive.
+Accepts the NDJSON or zipped Markdown formats produced by /api/notes/export/.
+"""
+
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.importer import (
+    IMPORT_BATCH_SIZE,
+    ArchiveTooLargeError,
+    import_notes,
+    iter_markdown_records,
+    iter_ndjson_records,
+)
+
+
+class Command(BaseCommand):
+    help = "Imports notes for a user from an NDJSON file or a zip of Markdown files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, .zip Markdown archive, or - for stdin")
+        parser.add_argument("--user", required=True, help="Username that will own the notes")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist")
+
+        path = options["path"]
+        try:
+            if path == "-":
+                result = import_notes(
+                    owner, iter_ndjson_records(sys.stdin.buffer), options["batch_size"]
+                )
+            elif path.lower().endswith(".zip"):
+                result = import_notes(owner, iter_markdown_records(path), options["batch_size"])
+            else:
+                with open(path, "rb") as stream:
+                    result = import_notes(
+                        owner, iter_ndjson_records(stream), options["batch_size"]
+                    )
+        except ArchiveTooLargeError as exc:
+            raise CommandError(f"Could not read archive: {exc}")
+
+        for error in result.errors:
+            self.stdout.write(self.style.WARNING(f"Skipped {error}"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result.created} notes in {result.seconds:.2f}s "
+                f"({result.notes_per_second:.0f} notes/s); skipped {result.skipped}."
+            )
+        )
@@ -0,0 +1,22 @@
+"""
+Management command to prune expired note tombstones.
+Tombstones older than NOTES_TOMBSTONE_RETENTION_DAYS can no longer be
+requested by delta sync, which answers such tokens with 410 Gone.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notes.models import NoteTombstone
+
+
+class Command(BaseCommand):
+    help = "Deletes note tombstones older than the delta sync retention window"
+
+    def handle(self, *args, **kwargs):
+        horizon = timezone.now() - timedelta(days=settings.NOTES_TOMBSTONE_RETENTION_DAYS)
+        deleted, _ = NoteTombstone.objects.filter(deleted_at__lt=horizon).delete()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} tombstones."))
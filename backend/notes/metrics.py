@@ -0,0 +1,481 @@
+"""
+Per-request performance metrics for the notes API.
+RequestMetricsMiddleware times every request served by a notes view and
+records, through a context variable, the database queries it ran (a wrapper
+installed on each connection), the time spent in authentication and in
+serializers, and the total; queries a serializer runs count in both phases.
+Each response reports them in a Server-Timing header, and the per-endpoint
+histograms are kept in this process and rendered in Prometheus text format
+by /api/metrics/.
+
+Every worker has its own histograms. When NOTES_METRICS_DIR is set, workers
+write snapshots there and the metrics endpoint sums them, so a scrape of any
+worker covers all of them. Snapshots of exited workers are folded into an
+archive file, keeping counters monotonic across worker restarts.
+"""
+import atexit
+import contextvars
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.crypto import constant_time_compare
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "notes_http_requests_total": (
+        "counter",
+        "Requests served by notes views.",
+        None,
+    ),
+    "notes_http_request_duration_seconds": (
+        "histogram",
+        "Total time to produce the response.",
+        DURATION_BUCKETS,
+    ),
+    "notes_http_request_phase_seconds": (
+        "histogram",
+        "Time spent per request in database queries, authentication and serializers.",
+        DURATION_BUCKETS,
+    ),
+    "notes_http_request_db_queries": (
+        "histogram",
+        "Database queries per request.",
+        QUERY_BUCKETS,
+    ),
+}
+
+PHASES = ("db", "auth", "serializer")
+
+_current = contextvars.ContextVar("notes_request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Measurements for the request being served."""
+
+    __slots__ = ("started", "db_queries", "db_time", "auth_time", "serializer_time", "active")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.auth_time = 0.0
+        self.serializer_time = 0.0
+        self.active = set()
+
+    def phase_seconds(self):
+        return {"db": self.db_time, "auth": self.auth_time, "serializer": self.serializer_time}
+
+
+class _Span:
+    """Adds the time spent inside it to one phase of the current request."""
+
+    __slots__ = ("metrics", "phase", "started")
+
+    def __init__(self, metrics, phase):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.metrics.active.add(self.phase)
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        self.metrics.active.discard(self.phase)
+        attr = f"{self.phase}_time"
+        setattr(self.metrics, attr, getattr(self.metrics, attr) + elapsed)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_no_span = _NoSpan()
+
+
+def measure(phase):
+    """
+    Time a block as "auth" or "serializer" work of the current request.
+    Nested blocks of the same phase count once; outside a measured request
+    this is a no-op.
+    """
+    metrics = _current.get()
+    if metrics is None or phase in metrics.active:
+        return _no_span
+    return _Span(metrics, phase)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries of the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection):
+    """Add record_query to a connection once; it stays for the connection's lifetime."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets):
+        # One slot per bucket plus +Inf, non-cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """Process-local counters and histograms, keyed by metric name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._last_flush = 0.0
+        self._flushed_pid = None
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            index = next(
+                (i for i, bound in enumerate(buckets) if value <= bound), len(buckets)
+            )
+            histogram.counts[index] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def snapshot(self):
+        """JSON-serializable copy of every series."""
+        with self._lock:
+            return {
+                "counters": [
+                    [name, list(labels), value] for (name, labels), value in self._counters.items()
+                ],
+                "histograms": [
+                    [name, list(labels), list(h.counts), h.sum, h.count]
+                    for (name, labels), h in self._histograms.items()
+                ],
+            }
+
+    def maybe_flush(self):
+        """Write this worker's snapshot to NOTES_METRICS_DIR at most every flush interval."""
+        if not settings.NOTES_METRICS_DIR:
+            return
+        now = time.monotonic()
+        if now - self._last_flush < settings.NOTES_METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        self.flush()
+
+    def flush_at_exit(self):
+        """Write the final snapshot of an exiting worker that recorded anything."""
+        if settings.NOTES_METRICS_DIR and self._counters:
+            self.flush()
+
+    def flush(self):
+        directory = Path(settings.NOTES_METRICS_DIR)
+        pid = os.getpid()
+        path = worker_snapshot_path(directory, pid)
+        if self._flushed_pid != pid:
+            # A file under our pid was left by an exited worker
+            with metrics_dir_lock(directory):
+                if path.exists():
+                    archive_snapshot(directory, path)
+            self._flushed_pid = pid
+        write_json(path, self.snapshot())
+
+
+registry = MetricsRegistry()
+
+
+def worker_snapshot_path(directory, pid):
+    return directory / f"worker-{pid}.json"
+
+
+@contextmanager
+def metrics_dir_lock(directory):
+    """Exclusive lock, across workers, for archive updates in NOTES_METRICS_DIR."""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")))
+    os.replace(tmp, path)
+
+
+def read_json(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def archive_snapshot(directory, path):
+    """Fold an exited worker's snapshot into the archive. Caller holds the lock."""
+    snapshot = read_json(path)
+    if snapshot is not None:
+        archive = directory / "archive.json"
+        write_json(archive, merge_snapshots([read_json(archive), snapshot]))
+    path.unlink(missing_ok=True)
+
+
+def clear_snapshots():
+    """Remove worker snapshots and the archive left by a previous server run."""
+    if not settings.NOTES_METRICS_DIR:
+        return 0
+    directory = Path(settings.NOTES_METRICS_DIR)
+    removed = 0
+    for path in [*directory.glob("worker-*.json*"), directory / "archive.json"]:
+        if path.exists():
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def pid_is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect_snapshots():
+    """
+    Snapshots to report: this worker's live series, plus, with a shared
+    NOTES_METRICS_DIR, the other workers' files and the archive.
+    """
+    snapshots = [registry.snapshot()]
+    if not settings.NOTES_METRICS_DIR:
+        return snapshots
+
+    registry.flush()
+    directory = Path(settings.NOTES_METRICS_DIR)
+    own_path = worker_snapshot_path(directory, os.getpid())
+    with metrics_dir_lock(directory):
+        for path in sorted(directory.glob("worker-*.json")):
+            if path == own_path:
+                continue
+            try:
+                pid = int(path.stem.removeprefix("worker-"))
+            except ValueError:
+                continue
+            if pid_is_alive(pid):
+                snapshots.append(read_json(path))
+            else:
+                archive_snapshot(directory, path)
+        snapshots.append(read_json(directory / "archive.json"))
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        if not snapshot:
+            continue
+        for name, labels, value in snapshot.get("counters", ()):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total, count in snapshot.get("histograms", ()):
+            if name not in METRICS or len(counts) != len(METRICS[name][2]) + 1:
+                continue
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = [list(counts), total, count]
+            else:
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+    return {
+        "counters": [
+            [name, [list(label) for label in labels], value]
+            for (name, labels), value in counters.items()
+        ],
+        "histograms": [
+            [name, [list(label) for label in labels], counts, total, count]
+            for (name, labels), (counts, total, count) in histograms.items()
+        ],
+    }
+
+
+def render_metrics():
+    """All workers' metrics in Prometheus text exposition format."""
+    merged = merge_snapshots(collect_snapshots())
+    series = {name: [] for name in METRICS}
+    for name, labels, value in merged["counters"]:
+        if name in series:
+            series[name].append(f"{name}{format_labels(labels)} {format_value(value)}")
+    for name, labels, counts, total, count in sorted(merged["histograms"]):
+        cumulative = 0
+        for bound, bucket_count in zip((*METRICS[name][2], "+Inf"), counts):
+            cumulative += bucket_count
+            le = bound if isinstance(bound, str) else format_value(bound)
+            series[name].append(
+                f"{name}_bucket{format_labels([*labels, ['le', le]])} {cumulative}"
+            )
+        series[name].append(f"{name}_sum{format_labels(labels)} {format_value(total)}")
+        series[name].append(f"{name}_count{format_labels(labels)} {count}")
+
+    lines = []
+    for name, (kind, help_text, _) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(sorted(series[name]) if kind == "counter" else series[name])
+    return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label_value(value)}"' for key, value in labels) + "}"
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def metrics_access_allowed(request):
+    """Staff sessions, or a bearer token matching NOTES_METRICS_TOKEN."""
+    token = settings.NOTES_METRICS_TOKEN
+    if token and constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_active and user.is_staff)
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures requests to notes views; see the module docstring.
+    Placed first in MIDDLEWARE so the total covers the whole stack.
+    Streaming responses are measured up to their headers.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.NOTES_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if settings.NOTES_METRICS_DIR:
+            atexit.register(registry.flush_at_exit)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    def finish(self, request, response, metrics):
+        endpoint = endpoint_name(request)
+        if endpoint is None:
+            return
+        total = time.perf_counter() - metrics.started
+        phases = metrics.phase_seconds()
+
+        labels = (("endpoint", endpoint), ("method", request.method))
+        registry.inc(
+            "notes_http_requests_total", (*labels, ("status", str(response.status_code)))
+        )
+        registry.observe("notes_http_request_duration_seconds", labels, total)
+        registry.observe("notes_http_request_db_queries", labels, metrics.db_queries)
+        for phase in PHASES:
+            registry.observe(
+                "notes_http_request_phase_seconds", (*labels, ("phase", phase)), phases[phase]
+            )
+        registry.maybe_flush()
+
+        if settings.NOTES_SERVER_TIMING:
+            response["Server-Timing"] = ", ".join(
+                [
+                    f'db;dur={phases["db"] * 1000:.2f};desc="{metrics.db_queries} queries"',
+                    f"auth;dur={phases['auth'] * 1000:.2f}",
+                    f"serializer;dur={phases['serializer'] * 1000:.2f}",
+                    f"total;dur={total * 1000:.2f}",
+                ]
+            )
+
+
+def endpoint_name(request):
+    """The URL name of the notes view that served request, or None for other requests."""
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.func.__module__.startswith("notes."):
+        return None
+    if match.url_name == "metrics":
+        return None
+    return match.view_name
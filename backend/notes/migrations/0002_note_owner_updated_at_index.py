@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['owner', '-updated_at', 'id'], name='notes_note_owner_i_5d94c8_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+"""
+Full-text search index for notes.
+SQLite gets an external-content FTS5 table kept in sync by triggers;
+PostgreSQL gets a GIN index over the tsvector expression used by notes.search.
+"""
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE notes_note_fts USING fts5(
+        title, content,
+        content='notes_note', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ai AFTER INSERT ON notes_note BEGIN
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ad AFTER DELETE ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_au AFTER UPDATE OF title, content ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO notes_note_fts(notes_note_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS notes_note_fts_au",
+    "DROP TRIGGER IF EXISTS notes_note_fts_ad",
+    "DROP TRIGGER IF EXISTS notes_note_fts_ai",
+    "DROP TABLE IF EXISTS notes_note_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX notes_note_search_idx ON notes_note
+    USING GIN (to_tsvector('english', title || ' ' || content))
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS notes_note_search_idx",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        statements = statements_by_vendor.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0002_note_owner_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            _run({"sqlite": SQLITE_REVERSE, "postgresql": POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,52 @@
+"""
+Indexes for category-filtered note lists and tombstone pruning.
+The (owner, category, -updated_at, id) index replaces (owner, category):
+it still serves per-category counts and also orders filtered lists.
+PostgreSQL additionally gets a BRIN index on tombstone deletion time,
+which stays tiny because tombstones are appended in time order.
+"""
+from django.conf import settings
+from django.db import migrations, models
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX notes_notetombstone_deleted_brin ON notes_notetombstone USING BRIN (deleted_at)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS notes_notetombstone_deleted_brin",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        statements = statements_by_vendor.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0004_notetombstone"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["owner", "category", "-updated_at", "id"],
+                name="notes_note_owner_i_4a192c_idx",
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="note",
+            name="notes_note_owner_i_fab781_idx",
+        ),
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD}),
+            _run({"postgresql": POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,70 @@
+"""
+Stored excerpt and content length, so note lists can skip loading content.
+Existing notes are backfilled in batches; updated_at is left untouched.
+SQLite adds and removes columns by rebuilding the table, which drops the
+full-text search triggers from 0003, so they are recreated after the
+fields are added and, when unapplying, after they are removed.
+"""
+from importlib import import_module
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+EXCERPT_LENGTH = 280
+
+search_index = import_module("notes.migrations.0003_note_search_index")
+
+SQLITE_TRIGGERS = [
+    statement.replace("CREATE TRIGGER", "CREATE TRIGGER IF NOT EXISTS")
+    for statement in search_index.SQLITE_FORWARD
+    if "CREATE TRIGGER" in statement
+]
+
+
+def make_excerpt(content):
+    # Frozen copy of notes.models.make_excerpt as of this migration
+    return " ".join(content[: EXCERPT_LENGTH * 4].split())[:EXCERPT_LENGTH]
+
+
+def backfill_excerpts(apps, schema_editor):
+    Note = apps.get_model("notes", "Note")
+    batch = []
+    for note in Note.objects.only("id", "content").order_by("id").iterator(chunk_size=BATCH_SIZE):
+        note.excerpt = make_excerpt(note.content)
+        note.content_length = len(note.content)
+        batch.append(note)
+        if len(batch) >= BATCH_SIZE:
+            Note.objects.bulk_update(batch, ["excerpt", "content_length"])
+            batch = []
+    if batch:
+        Note.objects.bulk_update(batch, ["excerpt", "content_length"])
+
+
+def restore_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in SQLITE_TRIGGERS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0005_note_list_indexes"),
+    ]
+
+    operations = [
+        # Reversed last, after RemoveField has rebuilt the table
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name="note",
+            name="excerpt",
+            field=models.CharField(blank=True, editable=False, max_length=280),
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="content_length",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_note_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilerSetting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sample_percent', models.FloatField(default=0, help_text='Percentage of requests to profile; 0 turns sampling off.', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('endpoint', models.CharField(blank=True, help_text='URL name to profile, such as note-list or login; blank for all profiled views.', max_length=100)),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Stop sampling after this time.', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0008_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RehashedAuthHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_auth_hash', models.CharField(max_length=128, unique=True)),
+                ('new_auth_hash', models.CharField(db_index=True, max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -3,9 +3,19 @@ Domain models for the notes app.
 Keeps data structures simple and focused on core business entities.
 """
 from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils.text import slugify
 
+# Characters of content kept in Note.excerpt for list previews
+EXCERPT_LENGTH = 280
+
+
+def make_excerpt(content):
+    """Whitespace-collapsed preview of content, at most EXCERPT_LENGTH characters."""
+    # Only a bounded prefix is scanned, however long the note is
+    return " ".join(content[: EXCERPT_LENGTH * 4].split())[:EXCERPT_LENGTH]
+
 
 class Category(models.Model):
     """
@@ -20,6 +30,7 @@ class Category(models.Model):
     )
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["name"]
@@ -39,10 +50,13 @@ class Note(models.Model):
     """
     Core note entity with title, content, and category association.
     Tracks creation and update timestamps for audit trail.
+    Stores an excerpt and the content length so lists can skip content.
     """
 
     title = models.CharField(max_length=255)
     content = models.TextField(blank=True)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False)
+    content_length = models.PositiveIntegerField(default=0, editable=False)
     category = models.ForeignKey(
         Category,
         on_delete=models.CASCADE,
@@ -60,9 +74,90 @@ class Note(models.Model):
         ordering = ["-updated_at"]
         indexes = [
             models.Index(fields=["-updated_at"]),
-            models.Index(fields=["owner", "category"]),
+            models.Index(fields=["owner", "category", "-updated_at", "id"]),
+            models.Index(fields=["owner", "-updated_at", "id"]),
         ]
 
     def __str__(self):
         return f"{self.title} ({self.category.name})"
 
+    def save(self, *args, **kwargs):
+        """Keep excerpt and content_length in step with content."""
+        if "content" not in self.get_deferred_fields():
+            self.update_excerpt()
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "content" in update_fields:
+                kwargs["update_fields"] = {*update_fields, "excerpt", "content_length"}
+        super().save(*args, **kwargs)
+
+    def update_excerpt(self):
+        """Recompute the stored excerpt; bulk_create / bulk_update callers must call this."""
+        self.excerpt = make_excerpt(self.content)
+        self.content_length = len(self.content)
+
+
+class NoteTombstone(models.Model):
+    """
+    Record of a deleted note, kept so delta sync can propagate deletions.
+    Pruned after NOTES_TOMBSTONE_RETENTION_DAYS by the prune_tombstones command.
+    """
+
+    note_id = models.BigIntegerField()
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="note_tombstones",
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["deleted_at"]
+        indexes = [
+            models.Index(fields=["owner", "deleted_at"]),
+        ]
+
+    def __str__(self):
+        return f"Deleted note {self.note_id}"
+
+
+class RehashedAuthHash(models.Model):
+    """
+    Session auth hash of a replaced password hash, mapped to the current one.
+    A background rehash (see notes.backends) changes the auth hash without a
+    password change, so bearer tokens issued for the old hash stay valid in
+    every worker through this table. Rows older than AUTH_TOKEN_MAX_AGE
+    can no longer match a valid token and are pruned as new rows are written.
+    """
+
+    old_auth_hash = models.CharField(max_length=128, unique=True)
+    new_auth_hash = models.CharField(max_length=128, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Rehashed auth hash {self.old_auth_hash[:8]}"
+
+
+class ProfilerSetting(models.Model):
+    """
+    Admin toggle for the request sampling profiler (see notes.profiling).
+    The first row applies: sample_percent of the requests to the profiled
+    views, optionally only one endpoint, are profiled until expires_at.
+    """
+
+    sample_percent = models.FloatField(
+        default=0,
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        help_text="Percentage of requests to profile; 0 turns sampling off.",
+    )
+    endpoint = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="URL name to profile, such as note-list or login; blank for all profiled views.",
+    )
+    expires_at = models.DateTimeField(
+        null=True, blank=True, help_text="Stop sampling after this time."
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Profile {self.sample_percent:g}% of {self.endpoint or 'all'} requests"
@@ -0,0 +1,163 @@
+"""
+Pagination classes for the notes API.
+Keyset pagination keeps deep pages as cheap as the first one.
+"""
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination,
+    _reverse_ordering,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class NoteCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (-updated_at, id).
+    Avoids the COUNT(*) and OFFSET scan of page-number pagination;
+    backed by the (owner, -updated_at, id) index on Note.
+    """
+
+    ordering = ("-updated_at", "id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.build_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async paginate_queryset for the ASGI note list; same cursors and pages."""
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.build_page([note async for note in page_queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        First half of CursorPagination.paginate_queryset: decode the cursor
+        and return the unevaluated slice holding the page plus one extra row.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            order = self.ordering[0]
+            is_reversed = order.startswith("-")
+            order_attr = order.lstrip("-")
+            if self.cursor.reverse != is_reversed:
+                queryset = queryset.filter(**{order_attr + "__lt": current_position})
+            else:
+                queryset = queryset.filter(**{order_attr + "__gt": current_position})
+
+        self._page_reverse = reverse
+        self._page_offset = offset
+        self._page_position = current_position
+        return queryset[offset : offset + self.page_size + 1]
+
+    def build_page(self, results):
+        """Second half: trim the fetched rows and work out next/previous positions."""
+        reverse = self._page_reverse
+        current_position = self._page_position
+        self.page = list(results[: self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (self._page_offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (self._page_offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class NotePageNumberPagination(PageNumberPagination):
+    """
+    Legacy page-number pagination for notes.
+    Opt-in for clients that still send ?page=N.
+    """
+
+
+class NoteSearchPagination(BasePagination):
+    """
+    Page-number pagination for ranked search results without a COUNT query.
+    Fetches one extra row to know whether a next page exists, since counting
+    full-text matches per owner is far slower than ranking a single page.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_query_param = "page"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound("Invalid page.")
+        if self.page_number < 1:
+            raise NotFound("Invalid page.")
+
+        offset = (self.page_number - 1) * self.page_size
+        rows = list(queryset[offset : offset + self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        return rows[: self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
@@ -0,0 +1,349 @@
+"""
+On-demand sampling profiler for live requests to NoteViewSet and the auth views.
+A request is profiled when a staff user sends "X-Notes-Profile: 1" (session
+or bearer token), or when the ProfilerSetting row in the admin samples it.
+While it runs, a sampler thread records the request thread's Python stack
+every NOTES_PROFILER_INTERVAL_MS; the stacks are written to NOTES_PROFILER_DIR
+as a speedscope or collapsed-stack file, named in the X-Notes-Profile
+response header, and only the newest NOTES_PROFILER_MAX_FILES are kept.
+Async views are sampled on the event loop only while their own coroutine
+runs, so time spent awaiting the database in other threads is not shown.
+With NOTES_PROFILER_DIR unset, profiled views cost one settings check.
+"""
+import functools
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import SignedTokenAuthentication
+from .models import ProfilerSetting
+
+PROFILE_HEADER = "X-Notes-Profile"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# Profiles running at once per process; further requests run unprofiled
+_slots = threading.BoundedSemaphore(2)
+_file_ids = itertools.count(1)
+
+
+class SamplingRuleCache:
+    """
+    The admin's ProfilerSetting, re-read at most every NOTES_PROFILER_REFRESH
+    seconds so unprofiled requests do not query it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rule = None
+        self._expires_at = 0.0
+
+    def get(self):
+        rule = self._current()
+        if rule is None:
+            rule = self._store(ProfilerSetting.objects.order_by("pk").first())
+        return rule
+
+    async def aget(self):
+        rule = self._current()
+        if rule is None:
+            rule = self._store(await ProfilerSetting.objects.order_by("pk").afirst())
+        return rule
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = 0.0
+
+    def _current(self):
+        with self._lock:
+            if time.monotonic() < self._expires_at:
+                return self._rule
+        return None
+
+    def _store(self, setting):
+        # False caches "no row", which None cannot
+        rule = setting or False
+        with self._lock:
+            self._rule = rule
+            self._expires_at = time.monotonic() + settings.NOTES_PROFILER_REFRESH
+        return rule
+
+
+rules = SamplingRuleCache()
+
+
+def rule_samples(rule, request):
+    """Whether the admin's sampling rule picks this request."""
+    if not rule or rule.sample_percent <= 0:
+        return False
+    if rule.expires_at is not None and rule.expires_at <= timezone.now():
+        return False
+    if rule.endpoint and rule.endpoint != endpoint_name(request):
+        return False
+    return random.random() * 100 < rule.sample_percent
+
+
+def endpoint_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.url_name if match else None
+
+
+def header_requested(request):
+    return request.headers.get(PROFILE_HEADER) == "1"
+
+
+def staff_requested(request):
+    """Whether a staff user sent the profile header, by session or bearer token."""
+    if not header_requested(request):
+        return False
+    user = request.user
+    if not user.is_authenticated:
+        authentication = SignedTokenAuthentication()
+        try:
+            token = authentication.get_token(request)
+            if token is None:
+                return False
+            user, _ = authentication.authenticate_credentials(token)
+        except AuthenticationFailed:
+            return False
+    return user.is_active and user.is_staff
+
+
+async def astaff_requested(request):
+    if not header_requested(request):
+        return False
+    user = await request.auser()
+    if not user.is_authenticated:
+        authentication = SignedTokenAuthentication()
+        try:
+            token = authentication.get_token(request)
+            if token is None:
+                return False
+            user, _ = await authentication.aauthenticate_credentials(token)
+        except AuthenticationFailed:
+            return False
+    return user.is_active and user.is_staff
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's stack until stopped. Only stacks that pass through
+    the anchor frame are kept, trimmed to start at it.
+    """
+
+    def __init__(self, thread_id, anchor, interval):
+        super().__init__(name="notes-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.anchor = anchor
+        self.interval = interval
+        self.samples = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.record(frame)
+
+    def record(self, frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            if frame is self.anchor:
+                break
+            frame = frame.f_back
+        else:
+            # The thread is running something other than this request
+            return
+        self.samples[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.anchor = None
+
+
+class RequestProfile:
+    """Samples the calling thread for one request and saves the result."""
+
+    def __init__(self, request, anchor, trigger):
+        self.request = request
+        self.trigger = trigger
+        self.sampler = StackSampler(
+            threading.get_ident(), anchor, settings.NOTES_PROFILER_INTERVAL_MS / 1000
+        )
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+
+    def save(self, response):
+        """Write the profile and name it in the response's X-Notes-Profile header."""
+        directory = Path(settings.NOTES_PROFILER_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = endpoint_name(self.request) or "unknown"
+        title = (
+            f"{self.request.method} {self.request.path} ({name}, {self.trigger}) "
+            f"{self.duration * 1000:.1f} ms"
+        )
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        stem = f"{stamp}-{name}-{self.request.method.lower()}-{os.getpid()}-{next(_file_ids)}"
+        if settings.NOTES_PROFILER_FORMAT == "collapsed":
+            path = directory / f"{stem}.collapsed.txt"
+            path.write_text(collapsed_stacks(self.sampler.samples))
+        else:
+            path = directory / f"{stem}.speedscope.json"
+            path.write_text(
+                json.dumps(speedscope_profile(self.sampler.samples, self.sampler.interval, title))
+            )
+        response[PROFILE_HEADER] = path.name
+        prune_profiles(directory, settings.NOTES_PROFILER_MAX_FILES)
+
+
+def frame_name(code):
+    return f"{code.co_qualname} ({short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def short_path(filename):
+    _, marker, rest = filename.rpartition("site-packages/")
+    if marker:
+        return rest
+    base = f"{settings.BASE_DIR}{os.sep}"
+    return filename.removeprefix(base)
+
+
+def collapsed_stacks(samples):
+    """Brendan Gregg's collapsed format: "root;...;leaf count" per stack."""
+    lines = [
+        ";".join(frame_name(code) for code in stack) + f" {count}"
+        for stack, count in samples.most_common()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def speedscope_profile(samples, interval, title):
+    """A speedscope "sampled" profile, weighted in milliseconds."""
+    frames = []
+    frame_ids = {}
+    stacks = []
+    weights = []
+    for stack, count in samples.most_common():
+        ids = []
+        for code in stack:
+            if code not in frame_ids:
+                frame_ids[code] = len(frames)
+                frames.append(
+                    {
+                        "name": code.co_qualname,
+                        "file": short_path(code.co_filename),
+                        "line": code.co_firstlineno,
+                    }
+                )
+            ids.append(frame_ids[code])
+        stacks.append(ids)
+        weights.append(count * interval * 1000)
+    return {
+        "$schema": SPEEDSCOPE_SCHEMA,
+        "name": title,
+        "exporter": "notes.profiling",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": title,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": stacks,
+                "weights": weights,
+            }
+        ],
+    }
+
+
+def prune_profiles(directory, keep):
+    """Delete all but the newest keep profiles."""
+    paths = [
+        path
+        for path in directory.iterdir()
+        if path.name.endswith((".speedscope.json", ".collapsed.txt"))
+    ]
+    if len(paths) <= keep:
+        return
+    paths.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in paths[keep:]:
+        path.unlink(missing_ok=True)
+
+
+def profiled(view_func):
+    """
+    Profile requests to view_func on request (see the module docstring).
+    Works for sync views and for coroutine views.
+    """
+    if iscoroutinefunction(view_func):
+
+        @functools.wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if not settings.NOTES_PROFILER_DIR:
+                return await view_func(request, *args, **kwargs)
+            trigger = await aprofile_trigger(request)
+            if trigger is None or not _slots.acquire(blocking=False):
+                return await view_func(request, *args, **kwargs)
+            try:
+                with RequestProfile(request, sys._getframe(), trigger) as profile:
+                    response = await view_func(request, *args, **kwargs)
+                profile.save(response)
+            finally:
+                _slots.release()
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not settings.NOTES_PROFILER_DIR:
+            return view_func(request, *args, **kwargs)
+        trigger = profile_trigger(request)
+        if trigger is None or not _slots.acquire(blocking=False):
+            return view_func(request, *args, **kwargs)
+        try:
+            with RequestProfile(request, sys._getframe(), trigger) as profile:
+                response = view_func(request, *args, **kwargs)
+            profile.save(response)
+        finally:
+            _slots.release()
+        return response
+
+    return wrapper
+
+
+def profile_trigger(request):
+    """"header" or "sampled" when the request should be profiled, else None."""
+    if staff_requested(request):
+        return "header"
+    if rule_samples(rules.get(), request):
+        return "sampled"
+    return None
+
+
+async def aprofile_trigger(request):
+    if await astaff_requested(request):
+        return "header"
+    if rule_samples(await rules.aget(), request):
+        return "sampled"
+    return None
@@ -0,0 +1,101 @@
+"""
+Process-level registry of the Category table.
+Categories are few and rarely change, so each worker keeps them all in
+memory: note serializers validate category ids against it and note reads
+attach categories from it instead of joining the table. The registry
+reloads when the categories version in the cache moves (bumped on commit
+of any Category save or delete), after NOTES_CATEGORY_REGISTRY_TTL
+seconds, which bounds staleness under the per-process locmem cache, and
+when a lookup misses a category another worker just created.
+Registry instances are shared between requests and must not be modified.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import CATEGORIES_VERSION_KEY, bump_categories_version
+from .models import Category
+
+
+class CategoryRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._categories = None
+        self._version = None
+        self._expires_at = 0.0
+
+    def categories(self):
+        """{pk: Category} for every category, in name order."""
+        version = cache.get(CATEGORIES_VERSION_KEY, 0)
+        categories = self._current(version)
+        if categories is None:
+            categories = self._store(version, list(Category.objects.order_by("name")))
+        return categories
+
+    async def acategories(self):
+        version = await cache.aget(CATEGORIES_VERSION_KEY, 0)
+        categories = self._current(version)
+        if categories is None:
+            categories = self._store(
+                version, [category async for category in Category.objects.order_by("name")]
+            )
+        return categories
+
+    def get(self, pk):
+        """The category with this pk, or None."""
+        category = self.categories().get(pk)
+        if category is None and Category.objects.filter(pk=pk).exists():
+            self.invalidate()
+            category = self.categories().get(pk)
+        return category
+
+    def invalidate(self):
+        with self._lock:
+            self._categories = None
+
+    def _current(self, version):
+        with self._lock:
+            if (
+                self._categories is not None
+                and self._version == version
+                and time.monotonic() < self._expires_at
+            ):
+                return self._categories
+        return None
+
+    def _store(self, version, categories):
+        mapping = {category.pk: category for category in categories}
+        with self._lock:
+            self._categories = mapping
+            self._version = version
+            self._expires_at = time.monotonic() + settings.NOTES_CATEGORY_REGISTRY_TTL
+        return mapping
+
+
+registry = CategoryRegistry()
+
+
+def invalidate_categories():
+    """Invalidate cached responses and every worker's registry after a category change."""
+    bump_categories_version()
+    registry.invalidate()
+
+
+def categories_state(categories):
+    """
+    (count, latest updated_at) of registry categories, for the validators of
+    responses that show category names or colours.
+    """
+    last_modified = max((category.updated_at for category in categories.values()), default=None)
+    return len(categories), last_modified
+
+
+def attach_categories(notes, categories):
+    """Set each note's category from the registry, so serializing it needs no query."""
+    for note in notes:
+        category = categories.get(note.category_id)
+        if category is not None:
+            note.category = category
+    return notes
@@ -0,0 +1,132 @@
+"""
+Full-text search over note title and content.
+Uses the SQLite FTS5 index or a Postgres tsvector expression index,
+both maintained by migration 0003_note_search_index.
+"""
+import re
+from html import escape
+
+from django.db import connections
+from django.db.models import Q, Value
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_CONTEXT_CHARS = 60
+SNIPPET_MAX_CHARS = 200
+
+# Must match the expression index created in 0003_note_search_index
+POSTGRES_SEARCH_VECTOR = "to_tsvector('english', notes_note.title || ' ' || notes_note.content)"
+
+
+def build_fts5_query(query):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+    Each term is quoted so user input cannot inject FTS5 operators;
+    the last term is prefix-matched for search-as-you-type.
+    """
+    terms = ['"{}"'.format(term.replace('"', '""')) for term in query.split()]
+    if not terms:
+        return None
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_notes(queryset, query):
+    """
+    Filter a Note queryset to rows matching the query.
+    Annotates search_rank, where higher is a better match.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        return _search_sqlite(queryset, query)
+    if vendor == "postgresql":
+        return _search_postgres(queryset, query)
+    return _search_fallback(queryset, query)
+
+
+def _search_sqlite(queryset, query):
+    match = build_fts5_query(query)
+    if match is None:
+        return queryset.none()
+    return queryset.extra(
+        tables=["notes_note_fts"],
+        where=["notes_note_fts.rowid = notes_note.id", "notes_note_fts MATCH %s"],
+        params=[match],
+        # bm25() is lower-is-better; weight title matches above content
+        select={"search_rank": "-bm25(notes_note_fts, 10.0, 1.0)"},
+    )
+
+
+def _search_postgres(queryset, query):
+    ts_query = "websearch_to_tsquery('english', %s)"
+    return queryset.extra(
+        where=[f"{POSTGRES_SEARCH_VECTOR} @@ {ts_query}"],
+        params=[query],
+        select={"search_rank": f"ts_rank_cd({POSTGRES_SEARCH_VECTOR}, {ts_query})"},
+        select_params=[query],
+    )
+
+
+def _search_fallback(queryset, query):
+    """Unindexed substring match for backends without a full-text index."""
+    return queryset.filter(Q(title__icontains=query) | Q(content__icontains=query)).annotate(
+        search_rank=Value(0.0)
+    )
+
+
+def load_ranked_notes(queryset, ranked):
+    """
+    Load full rows for a page of (pk, search_rank) pairs, keeping rank order.
+    Ranking over pks only keeps the sort narrow when a query matches many notes.
+    """
+    notes_by_pk = queryset.in_bulk([pk for pk, _ in ranked])
+    notes = []
+    for pk, rank in ranked:
+        note = notes_by_pk[pk]
+        note.search_rank = rank
+        notes.append(note)
+    return notes
+
+
+def highlight_notes(notes, query):
+    """
+    Set search_snippet on each note: an HTML-escaped excerpt with matches in <mark>.
+    Runs in Python over the returned page only; index-side snippet functions
+    would be evaluated for every match before ranking.
+    """
+    terms = [re.escape(term) for term in query.split()]
+    if not terms:
+        return
+    pattern = re.compile(r"\b(?:{})\w*".format("|".join(terms)), re.IGNORECASE)
+    for note in notes:
+        note.search_snippet = _build_snippet(note, pattern)
+
+
+def _build_snippet(note, pattern):
+    text = note.content
+    match = pattern.search(text)
+    if match is None:
+        text = note.title
+        match = pattern.search(text)
+
+    start = 0
+    if match is not None:
+        start = max(0, match.start() - SNIPPET_CONTEXT_CHARS)
+        # Avoid starting mid-word
+        if start:
+            space = text.find(" ", start, match.start())
+            start = space + 1 if space != -1 else start
+    end = min(len(text), start + SNIPPET_MAX_CHARS)
+    fragment = text[start:end]
+
+    parts = []
+    position = 0
+    for term in pattern.finditer(fragment):
+        parts.append(escape(fragment[position : term.start()]))
+        parts.append(f"{SNIPPET_START}{escape(term.group(0))}{SNIPPET_END}")
+        position = term.end()
+    parts.append(escape(fragment[position:]))
+
+    prefix = "…" if start else ""
+    suffix = "…" if end < len(text) else ""
+    return prefix + "".join(parts) + suffix
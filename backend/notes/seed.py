@@ -0,0 +1,61 @@
+"""
+Idempotent seed data: the default categories and the demo user.
+Shared by the seed_categories command and runner.py's startup pipeline,
+and cheap to re-run on every container start.
+"""
+from django.contrib.auth.models import User
+
+from .models import Category
+from .registry import invalidate_categories
+
+DEFAULT_CATEGORIES = [
+    {"name": "Random Thoughts", "color_hex": "#FFB08F", "slug": "random-thoughts"},  # Peach
+    {"name": "School", "color_hex": "#FFD966", "slug": "school"},  # Yellow
+    {"name": "Personal", "color_hex": "#7DD3C0", "slug": "personal"},  # Teal
+]
+
+DEMO_USERNAME = "demo"
+DEMO_EMAIL = "demo@example.com"
+DEMO_PASSWORD = "demo"
+
+
+def seed_categories():
+    """
+    Create the default categories that are missing, matched by slug.
+    One query finds the existing slugs and one bulk insert adds the rest.
+    Returns the names of the categories created.
+    """
+    slugs = [category["slug"] for category in DEFAULT_CATEGORIES]
+    existing = set(Category.objects.filter(slug__in=slugs).values_list("slug", flat=True))
+    missing = [Category(**category) for category in DEFAULT_CATEGORIES if category["slug"] not in existing]
+    if not missing:
+        return []
+
+    Category.objects.bulk_create(missing, ignore_conflicts=True)
+    # bulk_create skips the post_save signal that invalidates cached categories
+    invalidate_categories()
+    return [category.name for category in missing]
+
+
+def ensure_demo_user():
+    """
+    Make sure the demo user exists, is active and has the demo password.
+    The password is only re-hashed when it no longer matches, so an
+    unchanged demo user costs one lookup and one hash check.
+    Returns (user, changes) where changes lists what was fixed.
+    """
+    user = User.objects.filter(username=DEMO_USERNAME).first()
+    if user is None:
+        user = User.objects.create_user(DEMO_USERNAME, DEMO_EMAIL, DEMO_PASSWORD)
+        return user, ["created"]
+
+    changes = []
+    if not user.check_password(DEMO_PASSWORD):
+        user.set_password(DEMO_PASSWORD)
+        changes.append("password")
+    if not user.is_active:
+        user.is_active = True
+        changes.append("is_active")
+    if changes:
+        user.save(update_fields=changes)
+    return user, changes
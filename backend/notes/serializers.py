@@ -2,12 +2,50 @@
 DRF serializers for API data transformation.
 Maps domain models to JSON representations for the frontend.
 """
+from django.utils import timezone
 from rest_framework import serializers
 
+from .deltas import DeltaError, apply_text_delta
+from .metrics import measure
 from .models import Category, Note
+from .registry import registry as category_registry
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class NoteVersionConflictError(Exception):
+    """The note changed after the base_version an update was made against."""
+
+    def __init__(self, note):
+        super().__init__(note)
+        self.note = note
+
+
+class MeasuredSerializerMixin:
+    """Counts representation and validation time as serializer time in request metrics."""
+
+    def to_representation(self, instance):
+        with measure("serializer"):
+            return super().to_representation(instance)
+
+    def run_validation(self, data=serializers.empty):
+        with measure("serializer"):
+            return super().run_validation(data)
+
+
+class SearchResultMixin:
+    """
+    Adds search_rank and search_snippet to notes returned by a ?q= search.
+    Snippets are HTML-escaped with matched terms wrapped in <mark> tags.
+    """
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if hasattr(instance, "search_rank"):
+            data["search_rank"] = instance.search_rank
+            data["search_snippet"] = getattr(instance, "search_snippet", "")
+        return data
+
+
+class CategorySerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Category with note count.
     Provides read-only count of notes for sidebar display.
@@ -21,21 +59,122 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "slug", "created_at"]
 
     def get_note_count(self, obj):
-        """Return count of notes in this category for the current user."""
+        """
+        Return count of notes in this category for the current user.
+        Prefers the note_count annotation from CategoryViewSet.get_queryset,
+        then a precomputed category_note_counts map from the serializer context.
+        """
+        if hasattr(obj, "note_count"):
+            return obj.note_count
+        note_counts = self.context.get("category_note_counts")
+        if note_counts is not None:
+            return note_counts.get(obj.pk, 0)
         request = self.context.get("request")
         if request and hasattr(request, "user") and request.user.is_authenticated:
             return obj.notes.filter(owner=request.user).count()
         return 0
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class CategorySummarySerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    """
+    Lightweight Category representation without note counts.
+    Used for the side-loaded category map of compact note lists.
+    """
+
+    class Meta:
+        model = Category
+        fields = ["id", "name", "color_hex", "slug"]
+        read_only_fields = fields
+
+
+class CategoryField(serializers.PrimaryKeyRelatedField):
+    """Category by pk, validated against the process-level category registry."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        category = category_registry.get(pk)
+        if category is None:
+            self.fail("does_not_exist", pk_value=data)
+        return category
+
+
+class NoteBulkSerializer(serializers.ListSerializer):
+    """
+    List serializer behind NoteSerializer(many=True).
+    Writes with bulk_create / bulk_update instead of one save() per note;
+    updates match each item to its instance by "id".
+    """
+
+    @staticmethod
+    def item_id(data):
+        """The integer "id" of an update item, or None when missing or malformed."""
+        if not isinstance(data, dict):
+            return None
+        try:
+            return serializers.IntegerField().to_internal_value(data.get("id"))
+        except serializers.ValidationError:
+            return None
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            if not hasattr(self, "_instances_by_pk"):
+                self._instances_by_pk = {note.pk: note for note in self.instance}
+            pk = self.item_id(data)
+            if pk is None:
+                raise serializers.ValidationError({"id": ["A valid integer is required."]})
+            instance = self._instances_by_pk.get(pk)
+            if instance is None:
+                raise serializers.ValidationError({"id": ["Note not found."]})
+            self.child.instance = instance
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        owner = self.context["request"].user
+        notes = [Note(owner=owner, **attrs) for attrs in validated_data]
+        for note in notes:
+            note.update_excerpt()
+        return Note.objects.bulk_create(notes)
+
+    def update(self, instance, validated_data):
+        # bulk_update skips auto_now, so stamp updated_at explicitly
+        now = timezone.now()
+        notes_by_pk = {note.pk: note for note in instance}
+        notes = []
+        fields = {"updated_at"}
+        for item, attrs in zip(self.initial_data, validated_data):
+            note = notes_by_pk[self.item_id(item)]
+            for attr, value in attrs.items():
+                setattr(note, attr, value)
+            note.updated_at = now
+            fields.update(attrs)
+            if "content" in attrs:
+                note.update_excerpt()
+                fields.update(["excerpt", "content_length"])
+            notes.append(note)
+        Note.objects.bulk_update(notes, sorted(fields))
+        return notes
+
+
+class NoteSerializer(MeasuredSerializerMixin, SearchResultMixin, serializers.ModelSerializer):
     """
     Serializer for Note with nested category info.
     Auto-assigns owner from request context on creation.
+    Updates may send content_delta (see notes.deltas) instead of content,
+    made against base_version, the updated_at the client last saw.
+    Updates that change nothing are not written.
     """
 
+    category = CategoryField(queryset=Category.objects.all())
     category_detail = CategorySerializer(source="category", read_only=True)
     owner_username = serializers.CharField(source="owner.username", read_only=True)
+    content_delta = serializers.JSONField(write_only=True, required=False)
+    base_version = serializers.DateTimeField(write_only=True, required=False)
 
     class Meta:
         model = Note
@@ -49,11 +188,141 @@ class NoteSerializer(serializers.ModelSerializer):
             "owner_username",
             "created_at",
             "updated_at",
+            "content_delta",
+            "base_version",
         ]
         read_only_fields = ["id", "owner", "created_at", "updated_at"]
+        list_serializer_class = NoteBulkSerializer
+
+    def validate(self, attrs):
+        """
+        Check base_version against the note being updated and apply
+        content_delta to its stored content.
+        Raises NoteVersionConflictError when the note has moved on.
+        """
+        delta = attrs.pop("content_delta", None)
+        base_version = attrs.pop("base_version", None)
+        # Bulk items (self.parent is the list serializer) and creates have no base
+        if self.instance is None or self.parent is not None:
+            if delta is not None or base_version is not None:
+                raise serializers.ValidationError(
+                    {"content_delta": ["content_delta and base_version only apply to single-note updates."]}
+                )
+            return attrs
+
+        if base_version is not None and base_version != self.instance.updated_at:
+            raise NoteVersionConflictError(self.instance)
+        if delta is not None:
+            if "content" in attrs:
+                raise serializers.ValidationError(
+                    {"content_delta": ["Send content or content_delta, not both."]}
+                )
+            if base_version is None:
+                raise serializers.ValidationError(
+                    {"base_version": ["Required with content_delta."]}
+                )
+            try:
+                attrs["content"] = apply_text_delta(self.instance.content, delta)
+            except DeltaError as exc:
+                raise serializers.ValidationError({"content_delta": [str(exc)]})
+        return attrs
 
     def create(self, validated_data):
         """Auto-assign the current user as owner."""
         validated_data["owner"] = self.context["request"].user
         return super().create(validated_data)
 
+    def update(self, instance, validated_data):
+        """
+        Write only the fields whose values changed, and nothing at all for a
+        no-op, so updated_at, cached lists and ETags stay as they were.
+        changed_fields lists what was written.
+        """
+        self.changed_fields = [
+            attr
+            for attr, value in validated_data.items()
+            if field_value(instance, attr) != field_value(instance, attr, value)
+        ]
+        if self.changed_fields:
+            for attr in self.changed_fields:
+                setattr(instance, attr, validated_data[attr])
+            instance.save(update_fields=[*self.changed_fields, "updated_at"])
+        return instance
+
+
+def field_value(instance, attr, value=serializers.empty):
+    """The comparable value of a model field: the instance's, or value's if given."""
+    field = instance._meta.get_field(attr)
+    if value is serializers.empty:
+        return field.value_from_object(instance)
+    if field.is_relation and value is not None:
+        return value.pk
+    return value
+
+
+
+class NoteSummarySerializer(NoteSerializer):
+    """
+    Note representation for list responses.
+    Carries an excerpt and the content length instead of the content, which
+    is fetched with the note itself when it is opened.
+    """
+
+    content_delta = None
+    base_version = None
+
+    class Meta(NoteSerializer.Meta):
+        fields = [
+            "id",
+            "title",
+            "excerpt",
+            "content_length",
+            "category",
+            "category_detail",
+            "owner",
+            "owner_username",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
+class NoteListSerializer(MeasuredSerializerMixin, SearchResultMixin, serializers.ModelSerializer):
+    """
+    Compact Note representation for list responses.
+    References the category by id only; category details are side-loaded once per page.
+    """
+
+    class Meta:
+        model = Note
+        fields = [
+            "id",
+            "title",
+            "excerpt",
+            "content_length",
+            "category",
+            "owner",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
+class NoteSyncSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    """
+    Compact Note representation with full content, for the changes feed
+    that clients use to keep local copies of their notes.
+    """
+
+    class Meta:
+        model = Note
+        fields = [
+            "id",
+            "title",
+            "content",
+            "category",
+            "owner",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,100 @@
+"""
+Signal handlers for the notes app.
+Bump response cache versions whenever notes or categories change,
+refresh the category registry and the profiler's sampling rule, hand
+deferred password rehashes to the background thread after the response,
+and tune and instrument new database connections.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import (
+    attach_rehash_session,
+    discard_pending_rehashes,
+    evict_cached_user,
+    submit_pending_rehashes,
+)
+from .cache import bump_user_version
+from .db import apply_sqlite_pragmas
+from .metrics import install_query_recorder
+from .models import Category, Note, NoteTombstone, ProfilerSetting
+from .profiling import rules as profiler_rules
+from .registry import invalidate_categories
+
+
+@receiver([post_save, post_delete], sender=Note)
+def invalidate_owner_cache(sender, instance, **kwargs):
+    """Invalidate the owner's cached note and category lists."""
+    bump_user_version(instance.owner_id)
+
+
+@receiver(post_delete, sender=Note)
+def record_note_tombstone(sender, instance, origin=None, **kwargs):
+    """
+    Record a tombstone so delta sync can propagate the deletion.
+    Skipped when the owner is being deleted, since their tombstones go too.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if issubclass(origin_model, get_user_model()):
+        return
+    NoteTombstone.objects.create(note_id=instance.pk, owner_id=instance.owner_id)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories_cache(sender, instance, **kwargs):
+    """
+    Invalidate every user's cached lists and every worker's category registry.
+    Deferred to commit, so no worker reloads the registry before the change is visible.
+    """
+    transaction.on_commit(invalidate_categories)
+
+
+@receiver([post_save, post_delete], sender=ProfilerSetting)
+def refresh_profiler_rule(sender, instance, **kwargs):
+    """Apply admin changes here at once; other workers re-read within NOTES_PROFILER_REFRESH."""
+    profiler_rules.invalidate()
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def evict_user_from_auth_cache(sender, instance, **kwargs):
+    """Drop this process's cached copy so password and status changes apply."""
+    evict_cached_user(instance.pk)
+
+
+@receiver(request_started)
+def reset_pending_rehashes(sender, **kwargs):
+    discard_pending_rehashes()
+
+
+@receiver(user_logged_in)
+def track_rehash_session(sender, request, user, **kwargs):
+    """Let a pending password rehash also update the session being created."""
+    attach_rehash_session(request, user)
+
+
+@receiver(request_finished)
+def start_pending_rehashes(sender, **kwargs):
+    """Upgrade password hashes once the login response has been sent."""
+    submit_pending_rehashes()
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS once per connection; persistent connections keep them."""
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            apply_sqlite_pragmas(cursor, settings.SQLITE_PRAGMAS)
+
+
+@receiver(connection_created)
+def record_connection_queries(sender, connection, **kwargs):
+    """Count this connection's queries towards the request metrics."""
+    if settings.NOTES_METRICS:
+        install_query_recorder(connection)
@@ -0,0 +1,85 @@
+"""
+Delta sync for notes.
+Sync tokens are opaque to clients and encode an (updated_at, id) keyset
+position, so batches resume exactly where the previous one stopped.
+The token that ends a sync lags NOTES_SYNC_SAFETY_WINDOW seconds behind the
+read, because updated_at is stamped before commit: a write that commits just
+after the read can carry an earlier timestamp. Notes in the window are sent
+again by the next sync, so clients must apply changes idempotently.
+"""
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Note, NoteTombstone
+
+
+class SyncTokenExpiredError(Exception):
+    """The token predates tombstone retention; the client must refetch everything."""
+
+
+@dataclass
+class NoteChanges:
+    notes: list
+    deleted: list
+    sync_token: str
+    has_more: bool
+
+
+def encode_sync_token(timestamp, note_id=0):
+    micros = int(timestamp.timestamp() * 1_000_000)
+    return f"{micros}-{note_id}"
+
+
+def decode_sync_token(token):
+    """Return (timestamp, note_id) for a token; raises ValueError if malformed."""
+    micros, _, note_id = token.partition("-")
+    try:
+        timestamp = datetime.fromtimestamp(int(micros) / 1_000_000, tz=UTC)
+    except (OverflowError, OSError) as exc:
+        raise ValueError(f"Sync token timestamp out of range: {micros}") from exc
+    return timestamp, int(note_id or 0)
+
+
+def get_changes(user, token=None):
+    """
+    Return notes changed and deleted since a sync token.
+    Without a token, returns every note (a full sync) and no tombstones.
+    """
+    now = timezone.now()
+    notes = Note.objects.filter(owner=user).order_by("updated_at", "id")
+    tombstones = NoteTombstone.objects.filter(owner=user)
+
+    if token:
+        since, since_id = decode_sync_token(token)
+        horizon = now - timedelta(days=settings.NOTES_TOMBSTONE_RETENTION_DAYS)
+        if since < horizon:
+            raise SyncTokenExpiredError()
+        notes = notes.filter(
+            Q(updated_at__gt=since) | Q(updated_at=since, id__gt=since_id),
+        )
+        tombstones = tombstones.filter(deleted_at__gt=since)
+    else:
+        tombstones = tombstones.none()
+
+    batch_size = settings.NOTES_SYNC_BATCH_SIZE
+    changed = list(notes[: batch_size + 1])
+    has_more = len(changed) > batch_size
+    changed = changed[:batch_size]
+
+    if has_more:
+        # Resume after the last note; later tombstones arrive with the next batch
+        last = changed[-1]
+        upper, sync_token = last.updated_at, encode_sync_token(last.updated_at, last.id)
+    else:
+        upper = now - timedelta(seconds=settings.NOTES_SYNC_SAFETY_WINDOW)
+        sync_token = encode_sync_token(upper)
+        if token and since >= upper:
+            # Never move a client's position backwards
+            upper, sync_token = since, token
+
+    deleted = list(tombstones.filter(deleted_at__lte=upper).values_list("note_id", flat=True))
+    return NoteChanges(notes=changed, deleted=deleted, sync_token=sync_token, has_more=has_more)
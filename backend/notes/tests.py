@@ -0,0 +1,519 @@
+"""
+Tests for the notes API.
+"""
+import io
+import json
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from . import async_views
+from .authentication import issue_token
+from .backends import evict_cached_user, rehash_password
+from .importer import ArchiveTooLargeError, iter_ndjson_records
+from .models import Category, Note, NoteTombstone
+from .registry import registry as category_registry
+from .throttling import LoginIPThrottle
+
+
+class CategoryListQueryCountTests(APITestCase):
+    """The category list costs the same number of queries however much data there is."""
+
+    # Validator aggregate, registry load and the grouped per-category note count
+    expected_queries = 3
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="unused-password")
+        self.other = User.objects.create_user(username="other", password="unused-password")
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        cache.clear()
+        category_registry.invalidate()
+
+    def create_data(self, categories, notes_per_category):
+        for index in range(categories):
+            category = Category.objects.create(
+                name=f"Category {index}", slug=f"category-{index}", color_hex="#E8F5E9"
+            )
+            for owner in (self.user, self.other):
+                Note.objects.bulk_create(
+                    Note(title=f"Note {n}", content="text", category=category, owner=owner)
+                    for n in range(notes_per_category)
+                )
+
+    def fetch_categories(self):
+        # Cold response cache and registry, as for the first request after a change
+        cache.clear()
+        category_registry.invalidate()
+        with self.assertNumQueries(self.expected_queries):
+            response = self.client.get(reverse("category-list"))
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"]
+
+    def test_query_count_is_constant(self):
+        for categories, notes_per_category in [(1, 0), (3, 2), (10, 5), (25, 10)]:
+            with self.subTest(categories=categories, notes_per_category=notes_per_category):
+                Note.objects.all().delete()
+                Category.objects.all().delete()
+                self.create_data(categories, notes_per_category)
+                results = self.fetch_categories()
+                self.assertEqual(len(results), categories)
+                for category in results:
+                    self.assertEqual(category["note_count"], notes_per_category)
+
+    def test_counts_only_own_notes(self):
+        self.create_data(2, 3)
+        Note.objects.create(
+            title="Extra", content="", category=Category.objects.first(), owner=self.other
+        )
+        results = self.fetch_categories()
+        self.assertEqual([category["note_count"] for category in results], [3, 3])
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="unused-password")
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="School", color_hex="#E3F2FD")
+        Note.objects.create(title="Note", content="text", category=self.category, owner=self.user)
+
+    def tearDown(self):
+        cache.clear()
+        category_registry.invalidate()
+
+    def test_category_change_invalidates_etags(self):
+        for name in ("category-list", "note-list"):
+            with self.subTest(name=name):
+                etag = self.client.get(reverse(name))["ETag"]
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.category.color_hex = f"#{len(name):06d}"
+                    self.category.save()
+                response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+
+    def test_new_note_in_category_invalidates_detail_etag(self):
+        note = Note.objects.get()
+        url = reverse("note-detail", args=[note.pk])
+        first = self.client.get(url)
+        Note.objects.create(title="Other", content="", category=self.category, owner=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["category_detail"]["note_count"], 2)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+    async def test_new_note_in_category_invalidates_async_detail_etag(self):
+        note = await Note.objects.aget()
+
+        async def get(**headers):
+            request = AsyncRequestFactory().get(f"/api/notes/{note.pk}/", **headers)
+            request.auser = mock.AsyncMock(return_value=self.user)
+            return await async_views.note_detail(request, pk=note.pk)
+
+        first = await get()
+        await Note.objects.acreate(
+            title="Other", content="", category=self.category, owner=self.user
+        )
+        response = await get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["category_detail"]["note_count"], 2)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+
+class SearchTests(APITestCase):
+    """?q= search against the migrated full-text index and its triggers."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="unused-password")
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="School", color_hex="#E3F2FD")
+
+    def tearDown(self):
+        cache.clear()
+        category_registry.invalidate()
+
+    def create_note(self, title, content=""):
+        response = self.client.post(
+            reverse("note-list"),
+            {"title": title, "content": content, "category": self.category.pk},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def search(self, query):
+        response = self.client.get(reverse("note-list"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [note["id"] for note in response.data["results"]]
+
+    def test_created_note_is_found(self):
+        pk = self.create_note("Lecture", "photosynthesis in chloroplasts")
+        self.assertEqual(self.search("photosynthesis"), [pk])
+        self.assertEqual(self.search("lecture"), [pk])
+
+    def test_update_replaces_indexed_terms(self):
+        pk = self.create_note("Lecture", "photosynthesis")
+        response = self.client.patch(
+            reverse("note-detail", args=[pk]), {"content": "mitochondria"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search("photosynthesis"), [])
+        self.assertEqual(self.search("mitochondria"), [pk])
+
+    def test_deleted_note_is_forgotten(self):
+        kept = self.create_note("Kept", "photosynthesis")
+        deleted = self.create_note("Deleted", "photosynthesis")
+        bulk_deleted = self.create_note("Bulk deleted", "photosynthesis")
+        self.client.delete(reverse("note-detail", args=[deleted]))
+        self.client.delete(reverse("note-bulk"), {"ids": [bulk_deleted]}, format="json")
+        self.assertEqual(self.search("photosynthesis"), [kept])
+
+    def test_last_term_is_prefix_matched(self):
+        pk = self.create_note("Lecture", "photosynthesis in chloroplasts")
+        self.assertEqual(self.search("photosynthesis chloro"), [pk])
+        self.assertEqual(self.search("photo chloroplasts"), [])
+
+    def test_quotes_cannot_inject_operators(self):
+        alpha = self.create_note("Alpha", "first")
+        self.create_note("Beta", "second")
+        for query in ('alpha" OR "beta', 'alpha" OR beta', 'title:beta', '"', 'NEAR(alpha', '*'):
+            with self.subTest(query=query):
+                self.assertNotIn(self.search("beta")[0], self.search(query))
+        self.assertEqual(self.search('"alpha"'), [alpha])
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="unused-password")
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="School", color_hex="#E3F2FD")
+        self.note = Note.objects.create(
+            title="Before", content="text", category=self.category, owner=self.user
+        )
+
+    def tearDown(self):
+        cache.clear()
+        category_registry.invalidate()
+
+    def test_write_on_another_worker_is_not_served_stale(self):
+        # A queryset update sends no signals, like a write handled by a
+        # worker whose locmem cache holds different version counters
+        first = self.client.get(reverse("note-list"))
+        Note.objects.filter(pk=self.note.pk).update(title="After", updated_at=timezone.now())
+        response = self.client.get(reverse("note-list"), HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["title"], "After")
+
+
+class DeltaSyncTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="unused-password")
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="School", color_hex="#E3F2FD")
+
+    def test_out_of_range_token_is_rejected(self):
+        for token in ("99999999999999999999999-1", "-99999999999999999999999", "abc"):
+            with self.subTest(token=token):
+                response = self.client.get(reverse("note-changes"), {"since": token})
+                self.assertEqual(response.status_code, 400)
+
+    def test_late_commit_with_earlier_timestamp_is_delivered(self):
+        token = self.client.get(reverse("note-changes")).data["sync_token"]
+        # Stamped before the previous read, committed after it
+        note = Note.objects.create(
+            title="Late", content="", category=self.category, owner=self.user
+        )
+        Note.objects.filter(pk=note.pk).update(updated_at=timezone.now() - timedelta(seconds=1))
+        response = self.client.get(reverse("note-changes"), {"since": token})
+        self.assertEqual([item["id"] for item in response.data["notes"]], [note.pk])
+
+
+class NoteUpdateTests(APITestCase):
+    """No-op updates and content_delta edits against base_version."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="unused-password")
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="School", color_hex="#E3F2FD")
+        self.note = Note.objects.create(
+            title="Note", content="a😀b", category=self.category, owner=self.user
+        )
+        self.url = reverse("note-detail", args=[self.note.pk])
+
+    def tearDown(self):
+        cache.clear()
+        category_registry.invalidate()
+
+    def patch(self, data):
+        # json.dumps escapes lone surrogates, which the test client cannot encode
+        return self.client.patch(self.url, json.dumps(data), content_type="application/json")
+
+    def test_noop_update_is_not_written(self):
+        before = self.client.get(self.url)
+        response = self.patch({"title": "Note", "content": "a😀b", "category": self.category.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated_at"], before.data["updated_at"])
+        after = self.client.get(self.url, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, 304)
+
+    def test_delta_counts_utf16_units(self):
+        base_version = self.client.get(self.url).data["updated_at"]
+        delta = [{"retain": 3}, {"insert": "!"}, {"delete": 1}, {"insert": " done"}]
+        response = self.patch({"content_delta": delta, "base_version": base_version})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["content"], "a😀! done")
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, "a😀! done")
+        self.assertEqual(self.note.excerpt, "a😀! done")
+        self.assertEqual(self.note.content_length, len("a😀! done"))
+
+    def test_stale_base_version_conflicts(self):
+        base_version = self.client.get(self.url).data["updated_at"]
+        self.patch({"content": "changed elsewhere"})
+        response = self.patch(
+            {"content_delta": [{"insert": "x"}], "base_version": base_version}
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["note"]["content"], "changed elsewhere")
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, "changed elsewhere")
+
+    def test_delta_must_fit_the_text(self):
+        base_version = self.client.get(self.url).data["updated_at"]
+        for delta in (
+            [{"retain": 2}, {"insert": "x"}],
+            [{"retain": 1}, {"delete": 1}],
+            [{"retain": 5}],
+            [{"delete": 10}],
+            [{"insert": "\ud83d"}],
+            [{"move": 1}],
+            [],
+        ):
+            with self.subTest(delta=delta):
+                response = self.patch({"content_delta": delta, "base_version": base_version})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("content_delta", response.data)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, "a😀b")
+
+    def test_delta_is_rejected_in_bulk_updates(self):
+        base_version = self.client.get(self.url).data["updated_at"]
+        response = self.client.patch(
+            reverse("note-bulk"),
+            [{"id": self.note.pk, "content_delta": [{"insert": "x"}], "base_version": base_version}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, "a😀b")
+
+
+class BulkValidationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="unused-password")
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="School", color_hex="#E3F2FD")
+        self.note = Note.objects.create(
+            title="Note", content="", category=self.category, owner=self.user
+        )
+
+    def test_malformed_delete_ids_are_rejected(self):
+        for ids in (["abc"], [{}], [[1]], [True], "1", None):
+            with self.subTest(ids=ids):
+                response = self.client.delete(
+                    reverse("note-bulk"), {"ids": ids}, format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertTrue(Note.objects.filter(pk=self.note.pk).exists())
+
+    def test_malformed_update_ids_are_rejected(self):
+        for item_id in ([1], {}, "abc", None):
+            with self.subTest(item_id=item_id):
+                response = self.client.patch(
+                    reverse("note-bulk"), [{"id": item_id, "title": "x"}], format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_string_ids_are_accepted(self):
+        response = self.client.patch(
+            reverse("note-bulk"), [{"id": str(self.note.pk), "title": "Renamed"}], format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.delete(
+            reverse("note-bulk"), {"ids": [str(self.note.pk)]}, format="json"
+        )
+        self.assertEqual(response.data["deleted"], [self.note.pk])
+
+
+class BulkDeleteTests(APITestCase):
+    """Bulk delete costs the same number of queries however many notes go."""
+
+    # Id lookup, delete and tombstone insert, inside a savepoint
+    expected_queries = 5
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="unused-password")
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="School", color_hex="#E3F2FD")
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_query_count_is_constant(self):
+        for count in (1, 20, 200):
+            with self.subTest(count=count):
+                notes = Note.objects.bulk_create(
+                    Note(title=f"Note {n}", content="", category=self.category, owner=self.user)
+                    for n in range(count)
+                )
+                ids = [note.pk for note in notes]
+                with self.assertNumQueries(self.expected_queries):
+                    response = self.client.delete(
+                        reverse("note-bulk"), {"ids": [*ids, 0]}, format="json"
+                    )
+                self.assertEqual(response.data["deleted"], ids)
+                self.assertEqual(response.data["not_found"], [0])
+                self.assertFalse(Note.objects.filter(pk__in=ids).exists())
+                tombstones = NoteTombstone.objects.filter(note_id__in=ids)
+                self.assertEqual(sorted(tombstones.values_list("note_id", flat=True)), ids)
+
+
+class ImportLimitTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="unused-password")
+        self.client.force_authenticate(self.user)
+        Category.objects.create(name="School", color_hex="#E3F2FD")
+
+    def upload(self, files):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, data in files.items():
+                archive.writestr(name, data)
+        upload = SimpleUploadedFile("notes.zip", buffer.getvalue())
+        return self.client.post(reverse("note-import-archive"), {"file": upload})
+
+    @override_settings(NOTES_IMPORT_MAX_ENTRY_SIZE=1024)
+    def test_oversized_file_is_skipped_unread(self):
+        response = self.upload({"school/small.md": "fine", "school/bomb.md": "\0" * 10_000})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 1)
+        self.assertIn("school/bomb.md", response.data["errors"][0])
+
+    @override_settings(NOTES_IMPORT_MAX_TOTAL_SIZE=5000)
+    def test_archive_over_total_size_is_rejected(self):
+        response = self.upload({f"school/{n}.md": "x" * 1000 for n in range(6)})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Note.objects.exists())
+
+    @override_settings(NOTES_IMPORT_MAX_ENTRIES=3)
+    def test_archive_over_entry_count_is_rejected(self):
+        response = self.upload({f"school/{n}.md": "x" for n in range(4)})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Note.objects.exists())
+
+
+class NdjsonImportLimitTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="unused-password")
+        self.client.force_authenticate(self.user)
+        Category.objects.create(name="School", color_hex="#E3F2FD")
+
+    def upload(self, lines):
+        upload = SimpleUploadedFile("notes.ndjson", b"".join(lines))
+        return self.client.post(reverse("note-import-archive"), {"file": upload})
+
+    def record(self, title, content=""):
+        note = {"title": title, "content": content, "category": "school"}
+        return json.dumps(note).encode() + b"\n"
+
+    @override_settings(NOTES_IMPORT_MAX_ENTRY_SIZE=1024)
+    def test_oversized_line_is_skipped(self):
+        lines = [self.record("Before"), self.record("Huge", "x" * 10_000), self.record("After")]
+        response = self.upload(lines)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        self.assertIn("line 2", response.data["errors"][0])
+
+    @override_settings(NOTES_IMPORT_MAX_ENTRY_SIZE=1024)
+    def test_lines_are_read_in_bounded_reads(self):
+        stream = io.BytesIO(self.record("Huge", "x" * 10_000) + self.record("After"))
+        with mock.patch.object(stream, "readline", wraps=stream.readline) as readline:
+            records = list(iter_ndjson_records(stream))
+        self.assertEqual([source for source, _ in records], ["line 1", "line 2"])
+        self.assertIsInstance(records[0][1], ValueError)
+        self.assertTrue(all(0 < call.args[0] <= 1025 for call in readline.call_args_list))
+
+    @override_settings(NOTES_IMPORT_MAX_TOTAL_SIZE=5000)
+    def test_upload_over_total_size_is_rejected(self):
+        response = self.upload([self.record(f"Note {n}", "x" * 1000) for n in range(6)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Note.objects.exists())
+
+    @override_settings(NOTES_IMPORT_MAX_ENTRIES=3)
+    def test_upload_over_line_count_is_rejected(self):
+        response = self.upload([self.record(f"Note {n}") for n in range(4)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Note.objects.exists())
+
+    @override_settings(NOTES_IMPORT_MAX_ENTRIES=3)
+    def test_unseekable_stream_stops_at_the_limit(self):
+        stream = io.BufferedReader(io.BytesIO(b"".join(self.record("Note") for _ in range(4))))
+        stream.seekable = lambda: False
+        records = iter_ndjson_records(stream)
+        self.assertEqual(len([next(records) for _ in range(3)]), 3)
+        with self.assertRaises(ArchiveTooLargeError):
+            next(records)
+
+
+class LoginThrottleTests(APITestCase):
+    def tearDown(self):
+        cache.clear()
+
+    @mock.patch.object(LoginIPThrottle, "THROTTLE_RATES", {"login_ip": "2/min"})
+    def test_forwarded_for_does_not_reset_ip_limit(self):
+        statuses = [
+            self.client.post(
+                reverse("login"),
+                {"username": f"user{n}", "password": "wrong"},
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{n}",
+            ).status_code
+            for n in range(3)
+        ]
+        self.assertEqual(statuses, [401, 401, 429])
+
+
+class RehashedTokenTests(APITestCase):
+    def tearDown(self):
+        cache.clear()
+
+    @mock.patch("notes.backends.close_old_connections")
+    def test_token_survives_rehash_in_every_worker(self, close_old_connections):
+        user = User.objects.create_user(username="reader", password="unused-password")
+        token = issue_token(user)
+        old_encoded = user.password
+        rehash_password(user.pk, "unused-password", old_encoded)
+        rehash_password(user.pk, "unused-password", User.objects.get(pk=user.pk).password)
+        # Another worker: nothing of the rehash in its cache
+        cache.clear()
+        evict_cached_user(user.pk)
+        self.assertNotEqual(User.objects.get(pk=user.pk).password, old_encoded)
+        for _ in range(2):
+            response = self.client.get(reverse("me"), HTTP_AUTHORIZATION=f"Bearer {token}")
+            self.assertEqual(response.status_code, 200)
+
+    def test_token_stops_working_after_password_change(self):
+        user = User.objects.create_user(username="reader", password="unused-password")
+        token = issue_token(user)
+        user.set_password("another-password")
+        user.save()
+        response = self.client.get(reverse("me"), HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertIn(response.status_code, (401, 403))
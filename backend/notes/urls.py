@@ -2,10 +2,11 @@
 URL routing for notes API.
 Registers ViewSet routers and auth endpoints.
 """
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r"categories", views.CategoryViewSet, basename="category")
@@ -17,6 +18,36 @@ urlpatterns = [
     path("auth/login/", views.login_view, name="login"),
     path("auth/logout/", views.logout_view, name="logout"),
     path("auth/me/", views.me_view, name="me"),
+    # Operational endpoints
+    path("cache/stats/", views.cache_stats_view, name="cache-stats"),
+]
+
+if settings.NOTES_METRICS:
+    urlpatterns += [
+        path("metrics/", views.metrics_view, name="metrics"),
+    ]
+
+if settings.NOTES_ASYNC_API:
+    # Async list/retrieve/create for the ASGI server; other requests on these
+    # routes fall through to the sync NoteViewSet
+    urlpatterns += [
+        path("notes/", async_views.note_list, name="note-list-async"),
+        path("notes/<int:pk>/", async_views.note_detail, name="note-detail-async"),
+    ]
+
+if settings.SERVER_INTERFACE == "asgi":
+    # Ahead of the router, so exports stream instead of being buffered by ASGI
+    urlpatterns += [
+        path("notes/export/", async_views.note_export, name="note-export-async"),
+    ]
+
+if settings.NOTES_EVENT_STREAM:
+    # Registered ahead of the router, whose detail route would match "events"
+    urlpatterns += [
+        path("notes/events/", async_views.note_events, name="note-events"),
+    ]
+
+urlpatterns += [
     # ViewSet routes
     path("", include(router.urls)),
 ]
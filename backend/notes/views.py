@@ -3,50 +3,229 @@ API ViewSets using DRF ModelViewSet pattern.
 Implements filtering, permissions, and query optimization.
 """
 
+import logging
+import zipfile
+
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
-from django.db.models import Prefetch
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
-from rest_framework import status, viewsets
-from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.views.decorators.http import require_GET
+from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
-from .models import Category, Note
-from .serializers import CategorySerializer, NoteSerializer
+from .authentication import issue_token
+from .cache import bump_user_version, cache_response
+from .cache import stats as cache_stats
+from .conditional import conditional_get
+from .events import RESYNC, publish_note_event
+from .export import iter_markdown_zip, iter_ndjson
+from .importer import (
+    ArchiveTooLargeError,
+    import_notes,
+    iter_markdown_records,
+    iter_ndjson_records,
+)
+from .metrics import PROMETHEUS_CONTENT_TYPE, measure, metrics_access_allowed, render_metrics
+from .models import Category, Note, NoteTombstone
+from .pagination import NoteCursorPagination, NotePageNumberPagination, NoteSearchPagination
+from .profiling import profiled
+from .registry import attach_categories, categories_state
+from .registry import registry as category_registry
+from .search import highlight_notes, load_ranked_notes, search_notes
+from .serializers import (
+    CategorySerializer,
+    CategorySummarySerializer,
+    NoteBulkSerializer,
+    NoteListSerializer,
+    NoteSerializer,
+    NoteSummarySerializer,
+    NoteSyncSerializer,
+    NoteVersionConflictError,
+)
+from .sync import SyncTokenExpiredError, get_changes
+from .throttling import LoginIPThrottle, LoginUsernameThrottle
+
+logger = logging.getLogger(__name__)
 
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Read-only viewset for categories.
     Returns all categories with note counts for the current user.
+    Lists come from the process-level category registry plus one grouped
+    count over the user's notes.
+    Supports conditional GET via ETag / Last-Modified; list pages are cached.
     """
 
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        """
+        Annotate each category with the current user's note count.
+        A single aggregated query replaces one COUNT per category row.
+        """
+        return Category.objects.annotate(
+            note_count=Count("notes", filter=Q(notes__owner=self.request.user))
+        ).order_by("name")
+
+    def get_validator_state(self):
+        """
+        Validators for conditional GET: the user's note count and latest edit,
+        plus the category count and latest category change, so renames and
+        recolours are picked up. Note counts are the only per-user data here.
+        """
+        notes = Note.objects.filter(owner=self.request.user).aggregate(
+            count=Count("id"), last_modified=Max("updated_at")
+        )
+        category_count, categories_modified = categories_state(category_registry.categories())
+        last_modified = max(
+            filter(None, [notes["last_modified"], categories_modified]), default=None
+        )
+        return last_modified, (notes["count"], category_count)
+
+    @conditional_get
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        categories = list(category_registry.categories().values())
+        note_counts = dict(
+            Note.objects.filter(owner=request.user)
+            .values_list("category_id")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        context = {**self.get_serializer_context(), "category_note_counts": note_counts}
+        page = self.paginate_queryset(categories)
+        serializer = self.get_serializer_class()(
+            page if page is not None else categories, many=True, context=context
+        )
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class NoteViewSet(viewsets.ModelViewSet):
     """
     Full CRUD viewset for notes.
     Supports filtering by category_id query parameter.
     Automatically scopes to current user's notes.
+    Paginates with a cursor by default; ?page=N opts into page numbers.
+    ?view=compact returns slim notes plus a side-loaded category map.
+    ?q= runs a ranked full-text search over title and content.
+    Supports conditional GET via ETag / Last-Modified on list and retrieve.
+    List pages are served from the per-user versioned response cache.
+    /changes/?since=<token> returns only notes changed or deleted since a sync.
+    /bulk/ creates (POST), updates (PATCH) or deletes (DELETE) many notes at once.
+    /export/ streams every note as NDJSON or a zipped Markdown tree.
+    /import/ ingests an uploaded export archive with batched inserts.
+    PATCH accepts a content_delta against base_version; no-op updates are not written.
+    Writes publish live events to the owner's /events/ streams.
     """
 
+    bulk_max_items = 1000
+    # {category_id: count} counted with a retrieve's validators, see get_validator_state
+    detail_note_counts = None
+    # Numeric ids only, so /notes/events/ is a 404 when the stream is disabled
+    lookup_value_regex = r"\d+"
+
     serializer_class = NoteSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NoteCursorPagination
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        """Wrap each view in the on-demand sampling profiler (see notes.profiling)."""
+        return profiled(super().as_view(actions, **initkwargs))
+
+    @property
+    def paginator(self):
+        """
+        Use page-number pagination when the client asks for ?page=.
+        Search results are ordered by rank, which a keyset cursor cannot follow.
+        """
+        if not hasattr(self, "_paginator"):
+            if self.get_search_query():
+                self._paginator = NoteSearchPagination()
+            elif NotePageNumberPagination.page_query_param in self.request.query_params:
+                self._paginator = NotePageNumberPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_search_query(self):
+        """Return the stripped ?q= search text, or an empty string."""
+        return self.request.query_params.get("q", "").strip()
+
+    def is_compact_view(self):
+        """Whether the client asked for the compact list representation."""
+        return self.action == "list" and self.request.query_params.get("view") == "compact"
+
+    def get_serializer_class(self):
+        """
+        Lists carry excerpts instead of content, using the slim serializer
+        for compact list requests.
+        """
+        if self.is_compact_view():
+            return NoteListSerializer
+        if self.action == "list":
+            return NoteSummarySerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        """
+        Precompute per-category note counts for full list responses.
+        One grouped query replaces a COUNT per nested category_detail.
+        """
+        context = super().get_serializer_context()
+        if self.action in ("list", "bulk") and not self.is_compact_view():
+            context["category_note_counts"] = dict(self.get_category_note_counts())
+        elif self.detail_note_counts is not None:
+            context["category_note_counts"] = self.detail_note_counts
+        return context
+
+    async def aget_serializer_context(self):
+        """get_serializer_context for the ASGI note endpoints."""
+        context = super().get_serializer_context()
+        if self.action in ("list", "bulk") and not self.is_compact_view():
+            context["category_note_counts"] = {
+                category_id: count async for category_id, count in self.get_category_note_counts()
+            }
+        elif self.detail_note_counts is not None:
+            context["category_note_counts"] = self.detail_note_counts
+        return context
+
+    def get_category_note_counts(self):
+        """(category_id, count) rows for the current user's notes, one grouped query."""
+        return (
+            Note.objects.filter(owner=self.request.user)
+            .values_list("category_id")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
 
     def get_queryset(self):
         """
         Return notes owned by current user.
-        Optimizes queries with select_related for category.
+        Categories are attached from the category registry rather than joined.
+        Lists leave content unloaded, except for searches, which build
+        snippets from it.
         Supports optional category_id filter.
         """
         queryset = (
             Note.objects.filter(owner=self.request.user)
-            .select_related("category", "owner")
-            .order_by("-updated_at")
+            .select_related("owner")
+            .order_by("-updated_at", "id")
         )
 
         # Filter by category if provided
@@ -54,10 +233,307 @@ class NoteViewSet(viewsets.ModelViewSet):
         if category_id:
             queryset = queryset.filter(category_id=category_id)
 
+        if self.action == "list" and not self.get_search_query():
+            queryset = queryset.defer("content")
+
+        # Updates read, compare and write the row under its lock, so a
+        # content_delta always applies to the base_version it was made against
+        if self.action in ("update", "partial_update"):
+            queryset = queryset.select_for_update(of=("self",))
+
         return queryset
 
+    def get_validator_state(self):
+        """
+        Validators for conditional GET: count and latest updated_at of the
+        notes this request can see, from one aggregate over the owner index,
+        combined with the categories whose names and colours notes embed.
+        A retrieved note also embeds its category's note count, which is
+        counted here and handed to the serializer.
+        """
+        state = self.get_validator_queryset().aggregate(**self.get_validator_aggregates())
+        if self.action == "retrieve":
+            self.detail_note_counts = dict(
+                self.get_category_note_counts().filter(category_id=state["category_id"])
+            )
+        return self.combine_validator_state(state, category_registry.categories())
+
+    async def aget_validator_state(self):
+        """Async get_validator_state for the ASGI note endpoints."""
+        state = await self.get_validator_queryset().aaggregate(**self.get_validator_aggregates())
+        if self.action == "retrieve":
+            self.detail_note_counts = {
+                category_id: count
+                async for category_id, count in self.get_category_note_counts().filter(
+                    category_id=state["category_id"]
+                )
+            }
+        return self.combine_validator_state(state, await category_registry.acategories())
+
+    def get_validator_aggregates(self):
+        aggregates = {"count": Count("id"), "last_modified": Max("updated_at")}
+        if self.action == "retrieve":
+            aggregates["category_id"] = Max("category_id")
+        return aggregates
+
+    def combine_validator_state(self, state, categories):
+        category_count, categories_modified = categories_state(categories)
+        last_modified = max(
+            filter(None, [state["last_modified"], categories_modified]), default=None
+        )
+        return last_modified, (state["count"], category_count, self.detail_note_counts)
+
+    def get_validator_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset.order_by()
+
+    def get_event_data(self, note):
+        """Compact representation of a note for live events."""
+        return NoteListSerializer(note).data
+
+    def publish_notes(self, event_type, notes):
+        for note in notes:
+            publish_note_event(self.request.user.pk, event_type, self.get_event_data(note))
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.publish_notes("note.created", [serializer.instance])
+
+    def update(self, request, *args, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().update(request, *args, **kwargs)
+        except NoteVersionConflictError as conflict:
+            return Response(
+                {
+                    "error": "Note changed since base_version",
+                    "note": NoteSerializer(conflict.note, context=self.get_serializer_context()).data,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        if serializer.changed_fields:
+            self.publish_notes("note.updated", [serializer.instance])
+
+    def perform_destroy(self, instance):
+        pk = instance.pk
+        super().perform_destroy(instance)
+        publish_note_event(self.request.user.pk, "note.deleted", {"id": pk})
+
+    def get_object(self):
+        note = super().get_object()
+        attach_categories([note], category_registry.categories())
+        return note
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @conditional_get
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        """
+        List notes, or run a ranked ?q= full-text search.
+        Search ranks pks first and loads full rows for the returned page only.
+        Compact mode side-loads a deduplicated category map built from the
+        registry categories attached to the page, so no extra query is made.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        query = self.get_search_query()
+        if query:
+            ranked = search_notes(queryset, query).order_by("-search_rank", "-updated_at")
+            page = self.paginate_queryset(ranked.values_list("pk", "search_rank"))
+            notes = load_ranked_notes(queryset, page)
+            highlight_notes(notes, query)
+        else:
+            page = self.paginate_queryset(queryset)
+            notes = page if page is not None else list(queryset)
+        attach_categories(notes, category_registry.categories())
+
+        data = self.get_serializer(notes, many=True).data
+        if page is not None:
+            response = self.get_paginated_response(data)
+        else:
+            response = Response({"results": data} if self.is_compact_view() else data)
+
+        if self.is_compact_view():
+            response.data["categories"] = self.get_category_map(notes)
+        return response
+
+    def get_category_map(self, notes):
+        """Side-loaded {category_id: summary} map for a compact page of notes."""
+        categories = {note.category_id: note.category for note in notes}
+        return {
+            str(category_id): CategorySummarySerializer(category).data
+            for category_id, category in categories.items()
+        }
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        """
+        Delta sync: notes created/updated plus ids deleted since ?since=<token>.
+        Omit since for a full sync; keep calling with the returned sync_token
+        while has_more is true.
+        """
+        try:
+            changes = get_changes(request.user, request.query_params.get("since"))
+        except ValueError:
+            return Response(
+                {"error": "Invalid sync token"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except SyncTokenExpiredError:
+            return Response(
+                {"error": "Sync token expired, refetch all notes"},
+                status=status.HTTP_410_GONE,
+            )
+
+        return Response(
+            {
+                "notes": NoteSyncSerializer(changes.notes, many=True).data,
+                "deleted": changes.deleted,
+                "sync_token": changes.sync_token,
+                "has_more": changes.has_more,
+            }
+        )
+
+    @action(detail=False, methods=["post", "patch", "delete"])
+    def bulk(self, request):
+        """
+        Bulk create, update or delete notes in a single transaction.
+        POST: [{title, content, category}, ...]
+        PATCH: [{id, ...fields}, ...]
+        DELETE: {"ids": [...]}
+        Results are returned per item, in request order.
+        """
+        if request.method == "DELETE":
+            return self.bulk_delete(request)
+
+        instances = None
+        if request.method == "PATCH":
+            ids = [NoteBulkSerializer.item_id(item) for item in request.data]
+            instances = attach_categories(
+                list(Note.objects.filter(owner=request.user, id__in=ids).select_related("owner")),
+                category_registry.categories(),
+            )
+
+        serializer = NoteSerializer(
+            instances,
+            data=request.data,
+            many=True,
+            partial=request.method == "PATCH",
+            max_length=self.bulk_max_items,
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            notes = serializer.save()
+            self.publish_notes(
+                "note.created" if request.method == "POST" else "note.updated", notes
+            )
+
+        # bulk_create / bulk_update bypass the signals that invalidate the cache
+        bump_user_version(request.user.pk)
+        return Response(
+            self.get_serializer(notes, many=True).data,
+            status=status.HTTP_201_CREATED if request.method == "POST" else status.HTTP_200_OK,
+        )
+
+    def bulk_delete(self, request):
+        """
+        Delete notes by id with one filtered delete; reports ids not found.
+        Tombstones are written in one batch and the cache bumped once,
+        instead of by the per-row post_delete receivers.
+        """
+        ids_field = serializers.ListField(
+            child=serializers.IntegerField(), max_length=self.bulk_max_items
+        )
+        try:
+            ids = ids_field.run_validation(
+                request.data.get("ids") if isinstance(request.data, dict) else None
+            )
+        except serializers.ValidationError:
+            return Response(
+                {"error": f"ids must be a list of at most {self.bulk_max_items} note ids"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            notes = Note.objects.filter(owner=request.user, id__in=ids)
+            deleted = set(notes.values_list("id", flat=True))
+            # Nothing cascades from a note, so no signals means no per-row work
+            notes._raw_delete(notes.db)
+            NoteTombstone.objects.bulk_create(
+                NoteTombstone(note_id=pk, owner=request.user) for pk in deleted
+            )
+            for pk in deleted:
+                publish_note_event(request.user.pk, "note.deleted", {"id": pk})
+
+        bump_user_version(request.user.pk)
+        return Response(
+            {
+                "deleted": [pk for pk in ids if pk in deleted],
+                "not_found": [pk for pk in ids if pk not in deleted],
+            }
+        )
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream all of the user's notes as NDJSON (default) or, with
+        ?type=markdown, as a zip of Markdown files grouped by category slug.
+        """
+        queryset = Note.objects.filter(owner=request.user)
+        if request.query_params.get("type") == "markdown":
+            response = StreamingHttpResponse(
+                iter_markdown_zip(queryset), content_type="application/zip"
+            )
+            filename = "notes.zip"
+        else:
+            response = StreamingHttpResponse(
+                iter_ndjson(queryset), content_type="application/x-ndjson"
+            )
+            filename = "notes.ndjson"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser])
+    def import_archive(self, request):
+        """
+        Import notes from an uploaded "file": NDJSON, or a .zip of Markdown
+        files as produced by /export/?type=markdown. Reports counts and throughput.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "Upload an NDJSON or .zip archive as 'file'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            if upload.name.lower().endswith(".zip"):
+                records = iter_markdown_records(upload)
+            else:
+                records = iter_ndjson_records(upload)
+            result = import_notes(request.user, records)
+        except (zipfile.BadZipFile, ArchiveTooLargeError) as exc:
+            return Response(
+                {"error": f"Could not read archive: {exc}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # One event for the whole archive; clients refetch rather than apply it
+        publish_note_event(request.user.pk, RESYNC, {})
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
+
 
 # Authentication endpoints (simple session-based auth)
+@profiled
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @ensure_csrf_cookie
@@ -90,71 +566,49 @@ def register_view(request):
             "id": user.id,
             "username": user.username,
             "email": user.email,
+            "token": issue_token(user),
         },
         status=status.HTTP_201_CREATED,
     )
 
 
+@profiled
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle, LoginUsernameThrottle])
 @ensure_csrf_cookie
 def login_view(request):
     """
     Login user with session authentication.
     Expects: username, password
+    Also returns a signed bearer token for clients that skip the session.
+    One user lookup and one password hash per attempt; authenticate() hashes
+    a dummy password for unknown usernames so both paths take the same time.
     """
-    import logging
-
-    logger = logging.getLogger(__name__)
-
     username = request.data.get("username")
     password = request.data.get("password")
 
-    logger.info(f"Login attempt for username: {username}")
-    logger.info(f"Request data keys: {list(request.data.keys())}")
-    logger.info(f"Request method: {request.method}")
-    logger.info(f"Request path: {request.path}")
-
-    # Check if user exists
-    from django.contrib.auth.models import User
-
-    user_exists = User.objects.filter(username=username).exists()
-    logger.info(f"User '{username}' exists in database: {user_exists}")
-
-    if user_exists:
-        db_user = User.objects.get(username=username)
-        logger.info(
-            f"User found - ID: {db_user.id}, Active: {db_user.is_active}, Is Staff: {db_user.is_staff}"
-        )
-        logger.info(f"Password check result: {db_user.check_password(password)}")
-
-    user = authenticate(request, username=username, password=password)
-    logger.info(f"Authenticate result: {user is not None}")
-
-    if user is not None:
-        logger.info(f"Login successful for user: {user.username} (ID: {user.id})")
-        login(request, user)
-        logger.info(f"Session created - Session key: {request.session.session_key}")
-        return Response(
-            {
-                "id": user.id,
-                "username": user.username,
-                "email": user.email,
-            }
-        )
-    else:
-        logger.warning(f"Login failed for username: {username}")
-        # Additional debugging: check all users
-        all_users = User.objects.all()
-        logger.info(f"Total users in database: {all_users.count()}")
-        for u in all_users:
-            logger.info(f"  - User: {u.username}, Active: {u.is_active}")
+    with measure("auth"):
+        user = authenticate(request, username=username, password=password)
+    if user is None:
+        logger.info("Login failed for username %r", username)
         return Response(
             {"error": "Invalid credentials"},
             status=status.HTTP_401_UNAUTHORIZED,
         )
 
+    login(request, user)
+    return Response(
+        {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "token": issue_token(user),
+        }
+    )
+
 
+@profiled
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def logout_view(request):
@@ -163,6 +617,7 @@ def logout_view(request):
     return Response({"message": "Logged out successfully"})
 
 
+@profiled
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def me_view(request):
@@ -174,3 +629,22 @@ def me_view(request):
             "email": request.user.email,
         }
     )
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_stats_view(request):
+    """Return this worker's response cache hit/miss counters (staff only)."""
+    return Response(cache_stats.snapshot())
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Request metrics in Prometheus text format, for every worker when
+    NOTES_METRICS_DIR is shared. A plain Django view, so scrapers can send
+    NOTES_METRICS_TOKEN as a bearer token; staff sessions also work.
+    """
+    if not metrics_access_allowed(request):
+        return JsonResponse({"error": "Metrics require staff or the metrics token"}, status=403)
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,7 +1,8 @@
 import os
 import sys
-import subprocess
 import time
+from contextlib import contextmanager
+
 
 def log(message):
     """Log to both stdout and stderr for maximum visibility"""
@@ -9,90 +10,64 @@ def log(message):
     print(msg, file=sys.stdout, flush=True)
     print(msg, file=sys.stderr, flush=True)
 
-def run_command(command, error_message, exit_on_failure=True):
-    log(f"Running: {command}")
-    try:
-        # Run command and stream output
-        process = subprocess.Popen(
-            command, 
-            shell=True, 
-            stdout=sys.stdout, 
-            stderr=sys.stderr,
-            env=os.environ
-        )
-        return_code = process.wait()
-        
-        if return_code != 0:
-            log(f"Error: {error_message} (Exit code: {return_code})")
-            if exit_on_failure:
-                sys.exit(return_code)
-            return False
-        return True
-    except Exception as e:
-        log(f"Exception running command: {e}")
-        if exit_on_failure:
-            sys.exit(1)
-        return False
-
-def ensure_demo_user():
+@contextmanager
+def phase(step, name, timings):
+    """Log a startup phase and record its duration."""
     log("=" * 60)
-    log("CRITICAL: Verifying/Creating demo user...")
+    log(f"STEP {step}: {name}")
     log("=" * 60)
-    
-    # Setup Django environment
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings.append((name, elapsed))
+        log(f"{name} took {elapsed:.2f}s")
+
+def setup_django():
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
     import django
     django.setup()
-    
-    from django.contrib.auth.models import User
+
+def run_migrations():
+    """Apply migrations in-process, skipping the migrate command when none are pending."""
+    from django.core.management import call_command
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if not plan:
+        log("No unapplied migrations")
+        return
+    log(f"Applying {len(plan)} migration(s)...")
+    try:
+        call_command("migrate", interactive=False, verbosity=1)
+    except Exception as e:
+        log(f"Error: Migrations failed: {e}")
+        sys.exit(1)
+
+def seed_categories():
+    from notes.seed import seed_categories as seed
+
+    # Seeding is best-effort, as before: the app works without default categories
+    try:
+        created = seed()
+    except Exception as e:
+        log(f"Error: Seeding failed: {e}")
+        return
+    log(f"Created categories: {', '.join(created)}" if created else "Default categories present")
+
+def ensure_demo_user():
+    """Create or repair the demo user; the password is only re-hashed when it changed."""
     from django.conf import settings
-    
+
+    from notes.seed import ensure_demo_user as ensure
+
     try:
-        # Log database path
-        db_path = settings.DATABASES['default']['NAME']
-        log(f"Database path: {db_path}")
-        
-        # Check total users
-        total = User.objects.count()
-        log(f"Total users in database: {total}")
-        
-        # List all users
-        if total > 0:
-            log("Existing users:")
-            for u in User.objects.all():
-                log(f"  - {u.username} (ID: {u.id}, Active: {u.is_active})")
-        
-        # Check user
-        user = User.objects.filter(username='demo').first()
-        if user:
-            log(f"Demo user found (ID: {user.id}). Resetting password...")
-            user.set_password('demo')
-            user.is_active = True
-            user.save()
-            log("Password reset to 'demo'")
-        else:
-            log("Demo user not found. Creating now...")
-            user = User.objects.create_user('demo', 'demo@example.com', 'demo')
-            user.is_active = True
-            user.save()
-            log(f"Created demo user: {user.username} (ID: {user.id})")
-            
-        # Verify
-        user = User.objects.get(username='demo')
-        if user.check_password('demo'):
-            log("✓ Demo user verified successfully")
-            log(f"  Username: {user.username}")
-            log(f"  ID: {user.id}")
-            log(f"  Active: {user.is_active}")
-        else:
-            log("✗ Demo user password verification failed!")
-            sys.exit(1)
-            
-        # Final count
-        final_total = User.objects.count()
-        log(f"Total users after: {final_total}")
-        log("=" * 60)
-            
+        log(f"Database: {settings.DATABASES['default']['NAME']}")
+        user, changes = ensure()
+        log(f"✓ Demo user {user.username} (ID: {user.id}) " + (f"fixed: {', '.join(changes)}" if changes else "unchanged"))
     except Exception as e:
         log(f"✗ FATAL ERROR ensuring demo user: {e}")
         import traceback
@@ -100,14 +75,115 @@ def ensure_demo_user():
         traceback.print_exc(file=sys.stderr)
         sys.exit(1)
 
+def reset_metrics():
+    """Start request metrics from zero with the new server, as its workers do."""
+    from notes.metrics import clear_snapshots
+
+    removed = clear_snapshots()
+    if removed:
+        log(f"Cleared {removed} request metrics snapshot(s)")
+
+# Gunicorn worker classes by GUNICORN_WORKER_CLASS; uvicorn serves config.asgi
+# so the async note endpoints and event streams run on an event loop
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "uvicorn": "uvicorn_worker.UvicornWorker",
+}
+
+# Must match the NOTES_EVENT_BROKER default in config.settings
+IN_PROCESS_EVENT_BROKER = "notes.events.InProcessBroker"
+
+def default_workers(worker_class):
+    """
+    Workers for the CPUs this process may run on. Sync workers block on I/O,
+    so they get the usual 2 x CPUs + 1; gthread and uvicorn workers overlap
+    I/O themselves and get one per CPU.
+    """
+    cpus = os.process_cpu_count() or 1
+    return cpus * 2 + 1 if worker_class == "sync" else cpus
+
+def uses_in_process_events(server_interface):
+    """
+    Whether event streams are served with the in-process broker, which only
+    delivers events for writes handled by the stream's own worker. Read from
+    the environment, since settings were loaded before SERVER_INTERFACE was set.
+    """
+    return (
+        server_interface == "asgi"
+        and os.environ.get('NOTES_EVENT_STREAM', 'True') == 'True'
+        and os.environ.get('NOTES_EVENT_BROKER', IN_PROCESS_EVENT_BROKER) == IN_PROCESS_EVENT_BROKER
+    )
+
+def worker_count(worker_class, server_interface):
+    """
+    GUNICORN_WORKERS, else the default for the worker class. With the
+    in-process event broker the default is one worker, so every stream sees
+    every write; more workers are honoured with a warning.
+    """
+    workers = os.environ.get('GUNICORN_WORKERS')
+    if not uses_in_process_events(server_interface):
+        return int(workers or default_workers(worker_class))
+    if not workers:
+        log("Using 1 worker: the in-process event broker only reaches streams in its own worker")
+        return 1
+    if int(workers) > 1:
+        log(
+            f"Warning: {workers} workers with the in-process event broker; event streams miss "
+            "writes handled by other workers. Set NOTES_EVENT_BROKER to a shared broker "
+            "or NOTES_EVENT_STREAM=False"
+        )
+    return int(workers)
+
+def gunicorn_command():
+    """
+    Gunicorn argv from GUNICORN_* environment variables.
+    Also exports SERVER_INTERFACE to match the worker class, so settings
+    enable the async endpoints exactly when an ASGI worker serves them.
+    """
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS')
+    if not worker_class:
+        worker_class = "uvicorn" if os.environ.get('SERVER_INTERFACE') == "asgi" else "sync"
+    if worker_class not in WORKER_CLASSES:
+        log(f"Unknown GUNICORN_WORKER_CLASS {worker_class!r}; expected one of {', '.join(WORKER_CLASSES)}")
+        sys.exit(1)
+    server_interface = "asgi" if worker_class == "uvicorn" else "wsgi"
+    os.environ['SERVER_INTERFACE'] = server_interface
+    app = "config.asgi:application" if server_interface == "asgi" else "config.wsgi:application"
+
+    workers = worker_count(worker_class, server_interface)
+    max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+    max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', str(max_requests // 10)))
+
+    command = [
+        "gunicorn",
+        app,
+        "--bind", os.environ.get('GUNICORN_BIND', '0.0.0.0:8000'),
+        "--workers", str(workers),
+        "--worker-class", WORKER_CLASSES[worker_class],
+        "--timeout", os.environ.get('GUNICORN_TIMEOUT', '120'),
+        "--keep-alive", os.environ.get('GUNICORN_KEEPALIVE', '5'),
+        "--access-logfile", "-",
+        "--error-logfile", "-",
+    ]
+    if worker_class == "gthread":
+        command += ["--threads", os.environ.get('GUNICORN_THREADS', '4')]
+    if max_requests:
+        # Recycle workers to bound slow leaks; jitter keeps them from restarting together
+        command += ["--max-requests", str(max_requests), "--max-requests-jitter", str(max_requests_jitter)]
+    if os.environ.get('GUNICORN_PRELOAD', 'True') == 'True':
+        # Import Django once in the master; forked workers share its memory copy-on-write
+        command.append("--preload")
+    return command
+
 def main():
     log("=" * 60)
     log("RUNNER STARTING")
     log("=" * 60)
-    
+
     # Set unbuffered output
     os.environ['PYTHONUNBUFFERED'] = '1'
-    
+
     # Ensure database directory exists
     db_path = os.environ.get('DATABASE_PATH', '/app/data/db.sqlite3')
     log(f"DATABASE_PATH env var: {db_path}")
@@ -119,39 +195,31 @@ def main():
     else:
         log(f"Database directory already exists: {db_dir}")
 
-    log("=" * 60)
-    log("STEP 1: Running migrations")
-    log("=" * 60)
-    # 1. Run migrations
-    run_command("python manage.py migrate", "Migrations failed")
-    
-    log("=" * 60)
-    log("STEP 2: Seeding categories")
-    log("=" * 60)
-    # 2. Seed categories (ignore failure)
-    run_command("python manage.py seed_categories", "Seeding failed", exit_on_failure=False)
-    
-    log("=" * 60)
-    log("STEP 3: Ensuring demo user exists")
-    log("=" * 60)
-    # 3. Ensure demo user (Critical)
-    ensure_demo_user()
-    
+    # 1-3 run in this process, so Django is imported once rather than per step
+    timings = []
+    with phase(0, "Loading Django", timings):
+        setup_django()
+    with phase(1, "Running migrations", timings):
+        run_migrations()
+    with phase(2, "Seeding categories", timings):
+        seed_categories()
+    with phase(3, "Ensuring demo user exists", timings):
+        ensure_demo_user()
+    reset_metrics()
+
+    from django.db import connections
+    connections.close_all()
+    total = sum(elapsed for _, elapsed in timings)
+    log(f"Startup finished in {total:.2f}s: " + ", ".join(f"{name} {elapsed:.2f}s" for name, elapsed in timings))
+
     log("=" * 60)
     log("STEP 4: Starting Gunicorn server")
     log("=" * 60)
     # 4. Start Gunicorn
-    log("Starting Gunicorn...")
+    command = gunicorn_command()
+    log(f"Starting Gunicorn ({os.environ['SERVER_INTERFACE']}): {' '.join(command)}")
     # Replace current process with Gunicorn
-    os.execvp("gunicorn", [
-        "gunicorn", 
-        "config.wsgi:application", 
-        "--bind", "0.0.0.0:8000", 
-        "--workers", "2", 
-        "--timeout", "120", 
-        "--access-logfile", "-", 
-        "--error-logfile", "-"
-    ])
+    os.execvp("gunicorn", command)
 
 if __name__ == "__main__":
     main()
@@ -2,8 +2,8 @@
 
 import { useEffect, useState, Suspense } from "react";
 import { useRouter } from "next/navigation";
-import { useUser, useNotes } from "@/lib/hooks";
-import { Note } from "@/lib/api";
+import { useUser, useNotes, useNoteEvents } from "@/lib/hooks";
+import { NoteSummary } from "@/lib/api";
 import dynamic from "next/dynamic";
 
 // Dynamically import client islands with no SSR for better streaming
@@ -60,11 +60,11 @@ function NotesGridWrapper({
   NotesGridIsland,
 }: {
   categoryId: number | null;
-  onNoteClick: (note: Note) => void;
+  onNoteClick: (note: NoteSummary) => void;
   onNewNote: () => void;
   NotesGridIsland: React.ComponentType<{
     categoryId: number | null;
-    onNoteClick: (note: Note) => void;
+    onNoteClick: (note: NoteSummary) => void;
     onNewNote: () => void;
   }>;
 }) {
@@ -113,8 +113,9 @@ export default function DashboardContent() {
   const { data: user, isLoading: userLoading } = useUser();
   const [selectedCategoryId, setSelectedCategoryId] = useState<number | null>(null);
   const { data: notes } = useNotes(selectedCategoryId || undefined);
+  useNoteEvents(Boolean(user));
 
-  const [selectedNote, setSelectedNote] = useState<Note | null>(null);
+  const [selectedNote, setSelectedNote] = useState<NoteSummary | null>(null);
   const [isModalOpen, setIsModalOpen] = useState(false);
 
   // Redirect to auth if not logged in
@@ -124,7 +125,7 @@ export default function DashboardContent() {
     }
   }, [user, userLoading, router]);
 
-  const handleNoteClick = (note: Note) => {
+  const handleNoteClick = (note: NoteSummary) => {
     setSelectedNote(note);
     setIsModalOpen(true);
   };
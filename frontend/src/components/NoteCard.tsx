@@ -1,10 +1,10 @@
 "use client";
 
-import { Note } from "@/lib/api";
+import { NoteSummary } from "@/lib/api";
 import { formatDate } from "@/lib/utils";
 
 interface NoteCardProps {
-  note: Note;
+  note: NoteSummary;
   onClick: () => void;
 }
 
@@ -30,7 +30,7 @@ export default function NoteCard({ note, onClick }: NoteCardProps) {
       </h3>
 
       <p className="text-sm text-slate-600 line-clamp-3 mb-3">
-        {note.content || "No content"}
+        {note.excerpt || "No content"}
       </p>
 
       <div className="text-xs text-slate-400">
@@ -2,11 +2,13 @@
 
 import { useEffect, useRef, useState, useCallback } from "react";
 import { useForm } from "react-hook-form";
-import { Note } from "@/lib/api";
-import { useCategories, useCreateNote, useUpdateNote, useDeleteNote } from "@/lib/hooks";
+import axios from "axios";
+import { Note, NoteSummary } from "@/lib/api";
+import { useCategories, useCreateNote, useNote, useUpdateNote, useDeleteNote } from "@/lib/hooks";
+import { textDelta } from "@/lib/utils";
 
 interface NoteModalProps {
-  note: Note | null;
+  note: NoteSummary | null;
   isOpen: boolean;
   onClose: () => void;
 }
@@ -19,6 +21,11 @@ type NoteFormData = {
 
 export default function NoteModal({ note, isOpen, onClose }: NoteModalProps) {
   const { data: categories, isLoading: categoriesLoading } = useCategories();
+  // List entries only carry an excerpt, so edit the full note once it has been fetched
+  const { data: fullNote, isFetchedAfterMount } = useNote(note?.id);
+  const editedNote = note && isFetchedAfterMount ? fullNote ?? null : null;
+  const noteLoading = !!note && !editedNote;
+  const defaultCategoryId = categories?.[0]?.id;
   const createMutation = useCreateNote();
   const updateMutation = useUpdateNote();
   const deleteMutation = useDeleteNote();
@@ -27,8 +34,8 @@ export default function NoteModal({ note, isOpen, onClose }: NoteModalProps) {
   const { register, handleSubmit, watch, reset, setValue } = useForm<NoteFormData>({
     defaultValues: {
       title: note?.title || "",
-      content: note?.content || "",
-      category: note?.category || categories?.[0]?.id || 1,
+      content: "",
+      category: note?.category || defaultCategoryId || 1,
     },
   });
 
@@ -37,55 +44,85 @@ export default function NoteModal({ note, isOpen, onClose }: NoteModalProps) {
   // Use a ref to track the latest ID for save operations
   const currentNoteIdRef = useRef(currentNoteId);
 
+  // Last version of the note the server confirmed; saves send only what differs from it
+  const savedNoteRef = useRef<Note | null>(null);
+  // Id of the note loaded into the form; later refetches must not discard edits
+  const loadedNoteIdRef = useRef<number | null>(null);
+
   // Update ref when state changes
   useEffect(() => {
     currentNoteIdRef.current = currentNoteId;
   }, [currentNoteId]);
 
-  // Reset form when note prop changes
+  // Load the note into the form once its full content arrives
   useEffect(() => {
-    if (note) {
-      setCurrentNoteId(note.id);
-      reset({
-        title: note.title,
-        content: note.content,
-        category: note.category,
-      });
-    } else if (categories && Array.isArray(categories) && categories.length > 0) {
-      // Only reset to empty if we don't have a currentNoteId (meaning we are truly creating new)
-      if (!currentNoteId) {
-        reset({
-          title: "",
-          content: "",
-          category: categories[0].id,
-        });
-      }
-    }
-  }, [note, categories, reset]); // Removed currentNoteId from deps to prevent infinite reset loop
+    if (!editedNote || loadedNoteIdRef.current === editedNote.id) return;
+    loadedNoteIdRef.current = editedNote.id;
+    savedNoteRef.current = editedNote;
+    setCurrentNoteId(editedNote.id);
+    reset({
+      title: editedNote.title,
+      content: editedNote.content,
+      category: editedNote.category,
+    });
+  }, [editedNote, reset]);
+
+  // New notes default to the first category once categories have loaded
+  useEffect(() => {
+    // Only reset to empty if we don't have a currentNoteId (meaning we are truly creating new)
+    if (note || currentNoteIdRef.current || defaultCategoryId === undefined) return;
+    reset({
+      title: "",
+      content: "",
+      category: defaultCategoryId,
+    });
+  }, [note, defaultCategoryId, reset]);
 
   const performSave = useCallback(
     async (data: NoteFormData) => {
       if (!data.title.trim()) return; // Don't save empty notes
+      if (note && !savedNoteRef.current) return; // Full note not loaded yet
+
+      const idToUpdate = currentNoteIdRef.current || note?.id;
+      const saved = savedNoteRef.current;
+      const category = Number(data.category);
+      const changes: Parameters<typeof updateMutation.mutateAsync>[0]["data"] = {};
+      if (saved) {
+        if (data.title !== saved.title) changes.title = data.title;
+        if (category !== saved.category) changes.category = category;
+        if (data.content !== saved.content) {
+          // Ship only the edited span, not the whole note
+          changes.content_delta = textDelta(saved.content, data.content);
+          changes.base_version = saved.updated_at;
+        }
+        if (Object.keys(changes).length === 0) return; // Nothing to save
+      }
 
       setIsSaving(true);
       try {
-        const idToUpdate = currentNoteIdRef.current || note?.id;
-
         if (idToUpdate) {
-          await updateMutation.mutateAsync({
-            id: idToUpdate,
-            data: {
-              title: data.title,
-              content: data.content,
-              category: data.category,
-            },
-          });
+          let updated: Note;
+          try {
+            updated = await updateMutation.mutateAsync({
+              id: idToUpdate,
+              data: saved ? changes : { title: data.title, content: data.content, category },
+            });
+          } catch (error) {
+            if (!axios.isAxiosError(error) || error.response?.status !== 409) throw error;
+            // Edited elsewhere since we loaded it: this editor's text wins, as before
+            updated = await updateMutation.mutateAsync({
+              id: idToUpdate,
+              data: { title: changes.title, category: changes.category, content: data.content },
+            });
+          }
+          savedNoteRef.current = updated;
         } else {
           const newNote = await createMutation.mutateAsync({
             title: data.title,
             content: data.content,
             category: data.category,
           });
+          savedNoteRef.current = newNote;
           setCurrentNoteId(newNote.id);
         }
       } catch (error) {
@@ -167,6 +204,7 @@ export default function NoteModal({ note, isOpen, onClose }: NoteModalProps) {
             <input
               type="text"
               {...register("title")}
+              disabled={noteLoading}
               className="w-full px-4 py-2 border border-slate-300 rounded-lg focus:ring-2 focus:ring-teal focus:border-transparent"
               placeholder="Enter note title..."
             />
@@ -179,8 +217,9 @@ export default function NoteModal({ note, isOpen, onClose }: NoteModalProps) {
             <textarea
               {...register("content")}
               rows={12}
-              className="w-full px-4 py-2 border border-slate-300 rounded-lg focus:ring-2 focus:ring-teal focus:border-transparent resize-none"
-              placeholder="Start writing..."
+              disabled={noteLoading}
+              className="w-full px-4 py-2 border border-slate-300 rounded-lg focus:ring-2 focus:ring-teal focus:border-transparent resize-none disabled:bg-slate-50"
+              placeholder={noteLoading ? "Loading note..." : "Start writing..."}
             />
           </div>
         </div>
@@ -1,10 +1,10 @@
 "use client";
 
-import { Note } from "@/lib/api";
+import { NoteSummary } from "@/lib/api";
 import NoteModal from "@/components/NoteModal";
 
 interface NoteModalIslandProps {
-  note: Note | null;
+  note: NoteSummary | null;
   isOpen: boolean;
   onClose: () => void;
 }
@@ -1,17 +1,17 @@
 "use client";
 
 import { useNotes } from "@/lib/hooks";
-import { Note } from "@/lib/api";
+import { NoteSummary } from "@/lib/api";
 import NoteCard from "@/components/NoteCard";
 import { Suspense } from "react";
 
 interface NotesGridIslandProps {
   categoryId: number | null;
-  onNoteClick: (note: Note) => void;
+  onNoteClick: (note: NoteSummary) => void;
   onNewNote: () => void;
 }
 
-function NotesGridContent({ categoryId, onNoteClick }: { categoryId: number | null; onNoteClick: (note: Note) => void }) {
+function NotesGridContent({ categoryId, onNoteClick }: { categoryId: number | null; onNoteClick: (note: NoteSummary) => void }) {
   const { data: notes, isLoading } = useNotes(categoryId || undefined);
 
   if (isLoading) {
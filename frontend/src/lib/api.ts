@@ -3,6 +3,7 @@
  * Handles authentication with session cookies.
  */
 import axios from "axios";
+import type { TextDeltaOp } from "./utils";
 
 // Get API URL from environment variable
 // NOTE: NEXT_PUBLIC_* variables are embedded at BUILD TIME, not runtime
@@ -94,11 +95,14 @@ export interface User {
   email: string;
 }
 
-export interface Category {
+export interface CategorySummary {
   id: number;
   name: string;
   color_hex: string;
   slug: string;
+}
+
+export interface Category extends CategorySummary {
   note_count: number;
   created_at: string;
 }
@@ -108,20 +112,32 @@ export interface Note {
   title: string;
   content: string;
   category: number;
-  category_detail: Category;
+  category_detail: CategorySummary;
   owner: number;
-  owner_username: string;
+  owner_username?: string; // Omitted from compact list responses
   created_at: string;
   updated_at: string;
 }
 
+// Note list entries carry a preview instead of the content; fetch the note to edit it
+export interface NoteSummary extends Omit<Note, "content"> {
+  excerpt: string;
+  content_length: number;
+}
+
 interface PaginatedResponse<T> {
-  count: number;
+  count?: number; // Only present for page-number pagination (?page=N)
   next: string | null;
   previous: string | null;
   results: T[];
 }
 
+// Compact note list: notes reference categories by id, side-loaded once per page
+interface CompactNotesResponse
+  extends PaginatedResponse<Omit<NoteSummary, "category_detail" | "owner_username">> {
+  categories: Record<string, CategorySummary>;
+}
+
 // Auth API
 export const authApi = {
   register: async (username: string, password: string, email?: string) => {
@@ -169,11 +185,20 @@ export const categoriesApi = {
 // Notes API
 export const notesApi = {
   list: async (categoryId?: number) => {
-    const params = categoryId ? { category_id: categoryId } : {};
-    const { data } = await apiClient.get<PaginatedResponse<Note>>("/notes/", {
+    const params = {
+      view: "compact",
+      ...(categoryId ? { category_id: categoryId } : {}),
+    };
+    const { data } = await apiClient.get<CompactNotesResponse>("/notes/", {
       params,
     });
-    return data.results;
+    // Re-attach category details from the side-loaded map
+    return data.results.map(
+      (note): NoteSummary => ({
+        ...note,
+        category_detail: data.categories[String(note.category)],
+      })
+    );
   },
 
   get: async (id: number) => {
@@ -190,9 +215,17 @@ export const notesApi = {
     return data;
   },
 
+  // Send content_delta with base_version (the note's updated_at) instead of
+  // the full content; a 409 response means the note changed since then
   update: async (
     id: number,
-    noteData: Partial<{ title: string; content: string; category: number }>
+    noteData: Partial<{
+      title: string;
+      content: string;
+      category: number;
+      content_delta: TextDeltaOp[];
+      base_version: string;
+    }>
   ) => {
     const { data } = await apiClient.patch<Note>(`/notes/${id}/`, noteData);
     return data;
@@ -201,4 +234,7 @@ export const notesApi = {
   delete: async (id: number) => {
     await apiClient.delete(`/notes/${id}/`);
   },
+
+  // Server-Sent Events stream of the user's note changes (ASGI backends only)
+  eventsUrl: () => `${API_URL}/notes/events/`,
 };
@@ -2,6 +2,7 @@
  * Custom React Query hooks for data fetching.
  * Encapsulates API calls with caching and optimistic updates.
  */
+import { useEffect } from "react";
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
 import { authApi, categoriesApi, notesApi } from "./api";
 
@@ -69,6 +70,47 @@ export function useNotes(categoryId?: number) {
   });
 }
 
+// A single note with its full content; list entries only carry an excerpt
+export function useNote(id?: number) {
+  return useQuery({
+    queryKey: ["note", id],
+    queryFn: () => notesApi.get(id!),
+    enabled: !!id,
+    staleTime: 0, // Always edit the latest content
+  });
+}
+
+// Live updates: refetch notes when another tab or device changes them
+const NOTE_EVENTS = ["note.created", "note.updated", "note.deleted", "resync"];
+
+export function useNoteEvents(enabled: boolean) {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    if (!enabled || typeof EventSource === "undefined") return;
+
+    const source = new EventSource(notesApi.eventsUrl(), { withCredentials: true });
+    let connected = false;
+    const refetch = () => {
+      // Don't restart a refetch this tab's own mutation already started
+      queryClient.invalidateQueries(
+        { predicate: (query) => Array.isArray(query.queryKey) && query.queryKey[0] === "notes" },
+        { cancelRefetch: false }
+      );
+      queryClient.invalidateQueries({ queryKey: ["categories"] }, { cancelRefetch: false });
+    };
+    // Events sent while disconnected are not replayed, so refetch on reconnect
+    const onReady = () => {
+      if (connected) refetch();
+      connected = true;
+    };
+
+    source.addEventListener("ready", onReady);
+    NOTE_EVENTS.forEach((type) => source.addEventListener(type, refetch));
+    return () => source.close();
+  }, [enabled, queryClient]);
+}
+
 export function useCreateNote() {
   const queryClient = useQueryClient();
   return useMutation({
@@ -87,7 +129,8 @@ export function useUpdateNote() {
   return useMutation({
     mutationFn: ({ id, data }: { id: number; data: Parameters<typeof notesApi.update>[1] }) =>
       notesApi.update(id, data),
-    onSuccess: () => {
+    onSuccess: (note) => {
+      queryClient.setQueryData(["note", note.id], note);
       queryClient.invalidateQueries({
         predicate: (query) => Array.isArray(query.queryKey) && query.queryKey[0] === "notes",
       });
@@ -100,7 +143,8 @@ export function useDeleteNote() {
   const queryClient = useQueryClient();
   return useMutation({
     mutationFn: notesApi.delete,
-    onSuccess: () => {
+    onSuccess: (_, id) => {
+      queryClient.removeQueries({ queryKey: ["note", id] });
       queryClient.invalidateQueries({
         predicate: (query) => Array.isArray(query.queryKey) && query.queryKey[0] === "notes",
       });
@@ -56,3 +56,37 @@ export function debounce<T extends (...args: any[]) => any>(
   };
 }
 
+
+export type TextDeltaOp = { retain: number } | { delete: number } | { insert: string };
+
+/**
+ * Text delta turning `before` into `after` for PATCH content_delta:
+ * keep the common prefix and suffix, replace what lies between.
+ * Lengths are UTF-16 code units, matching the API; surrogate pairs are never split.
+ */
+export function textDelta(before: string, after: string): TextDeltaOp[] {
+  const isHighSurrogate = (code: number) => code >= 0xd800 && code <= 0xdbff;
+  const isLowSurrogate = (code: number) => code >= 0xdc00 && code <= 0xdfff;
+
+  const limit = Math.min(before.length, after.length);
+  let prefix = 0;
+  while (prefix < limit && before[prefix] === after[prefix]) prefix++;
+  if (prefix > 0 && isHighSurrogate(before.charCodeAt(prefix - 1))) prefix--;
+
+  let suffix = 0;
+  while (
+    suffix < limit - prefix &&
+    before[before.length - 1 - suffix] === after[after.length - 1 - suffix]
+  ) {
+    suffix++;
+  }
+  if (suffix > 0 && isLowSurrogate(before.charCodeAt(before.length - suffix))) suffix--;
+
+  const ops: TextDeltaOp[] = [];
+  if (prefix) ops.push({ retain: prefix });
+  const deleted = before.length - prefix - suffix;
+  if (deleted) ops.push({ delete: deleted });
+  const inserted = after.slice(prefix, after.length - suffix);
+  if (inserted) ops.push({ insert: inserted });
+  return ops;
+}